@@ -0,0 +1,109 @@
+"""
+Async fast path for the read-only list endpoints.
+
+Under ASGI (uvicorn workers) these views answer the common case, a plain GET
+of a full list, with the async Redis client: rate limits, the generation
+pointer, metadata and payload are read without tying up a thread, and the
+body is sent to slow clients without blocking a worker. Anything else
+(query parameters, a cache miss, a throttled client) is handed to the
+regular DRF viewset, which owns rebuilding the cache.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from redis import asyncio as aioredis
+from core.cache_utils import (
+    chunk_key, generation_key, generation_name, local_cache, metadata_key, payload_key, payload_size,
+)
+from core.ratelimit import acheck_limits
+from core.responses import apply_validators, async_streaming_response, not_modified_response, payload_response
+from core.throttling import as_drf_request, pending_limits, record_limit_results
+import zlib
+
+_client = None
+
+def get_async_redis():
+    """Process-wide redis.asyncio client for the cache database"""
+    global _client
+    if _client is None:
+        _client = aioredis.from_url(settings.CACHES['default']['LOCATION'])
+    return _client
+
+async def aget(client, key):
+    """cache.get() on the async client; values are decoded the way django-redis stored them"""
+    value = await client.get(cache.make_key(key))
+    return cache.client.decode(value) if value is not None else None
+
+async def aiter_chunked_json(client, name, metadata):
+    """Async iter_chunked_json, fetching the chunks in one MGET; None if any is missing"""
+    keys = [cache.make_key(chunk_key(name, index)) for index in range(metadata['total_chunks'])]
+    values = await client.mget(keys)
+    if any(value is None for value in values):
+        return None
+    chunks = [cache.client.decode(value) for value in values]
+
+    async def iterator():
+        yield b'['
+        first = True
+        for compressed in chunks:
+            items = zlib.decompress(compressed)[1:-1]
+            if not items:
+                continue
+            if not first:
+                yield b','
+            yield items
+            first = False
+        yield b']'
+    return iterator()
+
+async def check_throttles(request, view):
+    """
+    Evaluate the viewset's throttles in one async pipeline and record the
+    results the way evaluate_throttles does. Returns False if any is exceeded.
+    """
+    # Wrapped with the view's authenticators, so the keys match the ones DRF computes
+    limits = pending_limits(as_drf_request(request, view), view, view.get_throttles())
+    results = record_limit_results(request, await acheck_limits(get_async_redis(), limits))
+    return all(result.allowed for result in results.values())
+
+def async_list_view(viewset_class):
+    """Async view serving viewset_class's cached list, falling back to the DRF view"""
+    fallback = sync_to_async(viewset_class.as_view({'get': 'list', 'head': 'list'}))
+
+    async def view(request, *args, **kwargs):
+        if request.method != 'GET' or request.GET:
+            return await fallback(request, *args, **kwargs)
+
+        viewset = viewset_class()
+        if not await check_throttles(request, viewset):
+            # DRF builds the 429 from the results already recorded on the request
+            return await fallback(request, *args, **kwargs)
+
+        client = get_async_redis()
+        generation = await aget(client, generation_key(viewset.cache_name))
+        name = generation_name(viewset.cache_name, generation) if generation is not None else None
+        metadata = await aget(client, metadata_key(name)) if name else None
+        if metadata is None:
+            return await fallback(request, *args, **kwargs)
+
+        response = not_modified_response(request, metadata)
+        if response is not None:
+            return response
+
+        key = payload_key(name)
+        payload = local_cache.get(key, metadata['etag'])
+        if payload is None:
+            payload = await aget(client, key)
+            if payload is not None:
+                local_cache.set(key, metadata['etag'], payload, payload_size(payload))
+        if payload is not None:
+            return apply_validators(payload_response(request, payload), metadata)
+
+        if metadata.get('total_chunks'):
+            iterator = await aiter_chunked_json(client, name, metadata)
+            if iterator is not None:
+                return apply_validators(async_streaming_response(request, iterator), metadata)
+        return await fallback(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    return view
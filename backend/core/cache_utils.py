@@ -1,21 +1,80 @@
+from django.conf import settings
 from django.core.cache import cache
+from django_redis import get_redis_connection
+from collections import OrderedDict
+from contextlib import contextmanager
 import logging
+import threading
 import time
 from django.db import transaction
-from redis.exceptions import ConnectionError, TimeoutError
+from django.db.models import Count, Max
+from redis.exceptions import ConnectionError, RedisError, TimeoutError
+from django_redis.exceptions import ConnectionInterrupted
 from functools import wraps
 import backoff
 import zlib
-import json
-from django.core.serializers.json import DjangoJSONEncoder
+import hashlib
+from core.serializers import ValuesListSerializer, render_json
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
 
 logger = logging.getLogger(__name__)
 
 # Cache settings
 CACHE_TIMEOUT = 60 * 60 * 24
 LOCK_TIMEOUT = 60
+WARM_LOCK_TIMEOUT = 60 * 15  # A full warm can outlast a regular lock
 MAX_RETRIES = 3
 
+class LocalCache:
+    """
+    Per-process LRU of cached payloads, bounded by total size in bytes.
+    Entries are stored with the validator they were read under (an ETag or
+    data version) and only returned while the caller's current validator,
+    read from Redis on every request, still matches. The small validator
+    read is all that reaches Redis on a hit.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, validator):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != validator:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, validator, value, size):
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[2]
+            self.entries[key] = (validator, value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+local_cache = LocalCache(getattr(settings, 'L1_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+def payload_size(payload):
+    """Bytes held by a pre-encoded payload across all its encodings"""
+    return sum(len(body) for body in payload.values())
+
 class LazyLoader:
     """Lazy loader for models and serializers to avoid circular imports"""
     _course_model = None
@@ -74,6 +133,12 @@ lazy = LazyLoader()
 CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
 LOCK_TIMEOUT = 60  # 1 minute lock timeout
 MAX_RETRIES = 3
+RETIRED_GENERATION_TIMEOUT = 60 * 5  # Grace period for readers still on a replaced generation
+REBUILD_WAIT_TIMEOUT = 15  # How long a request waits on another worker's rebuild before doing it itself
+QUERY_CACHE_TIMEOUT = 60 * 10  # Filtered subsets are numerous and cheap to rebuild, so they expire quickly
+
+# What a Redis outage surfaces as: django-redis wraps client errors, raw connections raise redis-py's
+CACHE_ERRORS = (ConnectionInterrupted, RedisError)
 
 def with_redis_retry(func):
     @wraps(func)
@@ -89,16 +154,107 @@ def with_redis_retry(func):
     return wrapper
 
 @with_redis_retry
-def acquire_lock(lock_id):
+def acquire_lock(lock_id, timeout=LOCK_TIMEOUT):
     """Try to acquire a lock using cache with retry"""
     logger.info(f"Acquiring lock for {lock_id}")
-    return cache.add(f"lock_{lock_id}", True, LOCK_TIMEOUT)
+    return cache.add(f"lock_{lock_id}", True, timeout)
 
 @with_redis_retry
 def release_lock(lock_id):
-    """Release the lock with retry"""
+    """Release the lock with retry and wake up anyone waiting on it"""
     logger.info(f"Releasing lock for {lock_id}")
     cache.delete(f"lock_{lock_id}")
+    try:
+        get_redis_connection("default").publish(f"lock_released:{lock_id}", 1)
+    except Exception as e:
+        # Waiters also poll, so a lost notification only delays them
+        logger.warning(f"Could not notify waiters of {lock_id}: {str(e)}")
+
+@contextmanager
+def hold_lock(lock_id, timeout=LOCK_TIMEOUT):
+    """
+    Hold lock_id for as long as the with block runs, however long that is:
+    the lock is renewed in the background every third of its timeout, so it
+    only lapses if this process dies. Yields False, without waiting, if
+    someone else holds it.
+    """
+    if not acquire_lock(lock_id, timeout):
+        yield False
+        return
+
+    done = threading.Event()
+
+    def renew():
+        while not done.wait(timeout / 3):
+            try:
+                cache.touch(f"lock_{lock_id}", timeout)
+            except Exception as e:
+                logger.warning(f"Could not renew lock {lock_id}: {str(e)}")
+
+    renewer = threading.Thread(target=renew, daemon=True)
+    renewer.start()
+    try:
+        yield True
+    finally:
+        done.set()
+        renewer.join()
+        release_lock(lock_id)
+
+def wait_for_lock(lock_id, read, timeout=REBUILD_WAIT_TIMEOUT):
+    """
+    Wait for whoever holds lock_id to finish, then return read(). Returns
+    early as soon as read() finds a value, and None if the wait times out.
+    """
+    deadline = time.monotonic() + timeout
+    pubsub = None
+    try:
+        pubsub = get_redis_connection("default").pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(f"lock_released:{lock_id}")
+    except Exception as e:
+        logger.warning(f"Could not subscribe to {lock_id}, polling instead: {str(e)}")
+        pubsub = None
+
+    try:
+        # Checked after subscribing, so a release in between can't be missed
+        value = read()
+        while value is None and time.monotonic() < deadline:
+            remaining = min(1.0, deadline - time.monotonic())
+            if pubsub is not None:
+                pubsub.get_message(timeout=remaining)
+            else:
+                time.sleep(remaining)
+            value = read()
+            if value is None and not cache.get(f"lock_{lock_id}"):
+                break  # Holder finished (or died) without producing a value
+        return value
+    finally:
+        if pubsub is not None:
+            pubsub.close()
+
+def single_flight(lock_id, build, read, stale=None):
+    """
+    Make sure only one worker runs build() for lock_id at a time. The others
+    are served stale() if it has a value (stale-while-revalidate), otherwise
+    they wait for the rebuild to be published and read() it. A waiter only
+    builds itself if the rebuild doesn't show up in time.
+    """
+    if acquire_lock(lock_id):
+        try:
+            return build()
+        finally:
+            release_lock(lock_id)
+
+    if stale is not None:
+        value = stale()
+        if value is not None:
+            logger.info(f"Serving stale data while {lock_id} is rebuilt")
+            return value
+
+    value = wait_for_lock(lock_id, read)
+    if value is None:
+        logger.warning(f"Gave up waiting for {lock_id}, building in this worker")
+        value = build()
+    return value
 
 @with_redis_retry
 def set_cache_data(key, data):
@@ -106,107 +262,377 @@ def set_cache_data(key, data):
     logger.info(f"Setting cache data for {key}")
     cache.set(key, data, CACHE_TIMEOUT)
     
-def is_cache_warming():
-    """Check if cache is currently being warmed"""
-    return cache.get('cache_warming_in_progress', False)
+def payload_key(name):
+    """Cache key of the pre-encoded list body for a dataset"""
+    return f'{name}_payload'
 
-def warm_cache():
-    """Warm up the cache with all necessary data"""
-    try:
-        if not acquire_lock("cache_warming"):
-            logger.info("Another process is warming the cache, skipping...")
-            return
+def metadata_key(name):
+    """Cache key of the validators and stats for a dataset"""
+    return f'{name}_metadata'
+
+def version_key(name):
+    """Cache key of the data version counter for a dataset"""
+    return f'{name}_version'
+
+def chunk_key(name, index):
+    """Cache key of one compressed JSON array chunk of a dataset"""
+    return f'{name}_data_chunk_{index}'
+
+def generation_key(name):
+    """Cache key of the pointer to a dataset's current generation"""
+    return f'{name}_generation'
+
+def previous_generation_key(name):
+    """Cache key of the pointer to the generation replaced last, for stale reads"""
+    return f'{name}_previous_generation'
+
+def generation_name(name, generation):
+    """Namespace for every key belonging to one generation of a dataset"""
+    return f'{name}_g{generation}'
+
+# (gzip level, brotli quality). Builds on the request path must finish well
+# within LOCK_TIMEOUT, so they use fast settings; warm_cache runs outside any
+# request and can afford the smallest output
+REQUEST_COMPRESSION = (6, 5)
+WARM_COMPRESSION = (9, 11)
+
+class PayloadEncoder:
+    """
+    Incrementally compress a rendered body for every supported Content-Encoding
+    while hashing it, so large bodies can be encoded piece by piece without
+    ever holding the uncompressed whole in memory.
+    """
+    def __init__(self, compression=REQUEST_COMPRESSION):
+        gzip_level, brotli_quality = compression
+        self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+        self._brotli = brotli.Compressor(quality=brotli_quality) if brotli is not None else None
+        self._parts = {'gzip': [], 'br': []}
+        self._digest = hashlib.md5()
+        self.size = 0
+
+    def update(self, data):
+        self._digest.update(data)
+        self.size += len(data)
+        self._parts['gzip'].append(self._gzip.compress(data))
+        if self._brotli is not None:
+            self._parts['br'].append(self._brotli.process(data))
+        return self
+
+    def finish(self, last_modified=None, **extra):
+        """
+        Return (payload, metadata). last_modified is a datetime (typically
+        the max modified_at) or None; extra keys are merged into metadata.
+        """
+        self._parts['gzip'].append(self._gzip.flush())
+        payload = {'gzip': b''.join(self._parts['gzip'])}
+        if self._brotli is not None:
+            self._parts['br'].append(self._brotli.finish())
+            payload['br'] = b''.join(self._parts['br'])
+        metadata = {
+            # Weak: the br, gzip and identity bodies are different bytes of the
+            # same representation, so one validator can't be strong for all of them
+            'etag': 'W/"%s"' % self._digest.hexdigest(),
+            'last_modified': int(last_modified.timestamp()) if last_modified else None,
+            'size': self.size,
+            **extra,
+        }
+        return payload, metadata
+
+def build_payload(body, last_modified=None, compression=REQUEST_COMPRESSION, **extra):
+    """
+    Encode a rendered body and compute its metadata in the same pass, so the
+    validators are derived once per cache build instead of once per request.
+    """
+    return PayloadEncoder(compression).update(body).finish(last_modified, **extra)
+
+@with_redis_retry
+def get_cached_payload(key, etag=None):
+    """
+    Get a pre-encoded payload, or None on a miss. Passing the ETag from the
+    payload's metadata lets it be served from the process-local cache.
+    """
+    if etag is not None:
+        payload = local_cache.get(key, etag)
+        if payload is not None:
+            return payload
+    payload = cache.get(key)
+    if payload is not None and etag is not None:
+        local_cache.set(key, etag, payload, payload_size(payload))
+    return payload
 
+@with_redis_retry
+def get_cached_metadata(name):
+    """Get the metadata of a dataset, or None if it hasn't been built"""
+    return cache.get(metadata_key(name))
+
+def set_cached_payload(name, payload, metadata):
+    """Store a payload and its metadata, body first so validators never outlive it"""
+    set_cache_data(payload_key(name), payload)
+    set_cache_data(metadata_key(name), metadata)
+    local_cache.set(payload_key(name), metadata['etag'], payload, payload_size(payload))
+
+@with_redis_retry
+def get_generation(name):
+    """Current generation of a dataset, or None if no complete snapshot is published"""
+    return cache.get(generation_key(name))
+
+def get_current_name(name):
+    """Namespace of the current generation of a dataset, or None"""
+    generation = get_generation(name)
+    return generation_name(name, generation) if generation is not None else None
+
+@with_redis_retry
+def get_previous_name(name):
+    """Namespace of the generation replaced last, while it is still within its grace period"""
+    generation = cache.get(previous_generation_key(name))
+    return generation_name(name, generation) if generation is not None else None
+
+@with_redis_retry
+def new_generation(name):
+    """Allocate a fresh generation number to write a snapshot under"""
+    sequence_key = f'{name}_generation_seq'
+    cache.add(sequence_key, 0, None)
+    return cache.incr(sequence_key)
+
+@with_redis_retry
+def retire_generation(name, generation):
+    """Let every key of a replaced generation expire after a grace period"""
+    target = generation_name(name, generation)
+    metadata = cache.get(metadata_key(target)) or {}
+    keys = [payload_key(target), metadata_key(target)]
+    keys += [chunk_key(target, index) for index in range(metadata.get('total_chunks') or 0)]
+    for key in keys:
+        cache.touch(key, RETIRED_GENERATION_TIMEOUT)
+
+# KEYS: version counter, generation pointer. ARGV: version the build was read
+# under, generation, pointer timeout. Flips the pointer only while the data
+# version is still the one the build started from; returns the generation it
+# replaced (nil if none), or -1 if the data changed and the build is stale.
+PUBLISH_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return -1
+end
+local previous = redis.call('GET', KEYS[2])
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+return previous
+"""
+
+@with_redis_retry
+def publish_generation(name, generation, version):
+    """
+    Atomically make a fully written generation current: readers resolve the
+    pointer once per request, so they see either the old or the new
+    snapshot, never a mix of both. version is the data version read before
+    the generation was built; if invalidate_dataset has bumped it since,
+    the generation may hold pre-import rows and is retired instead.
+    Returns whether the generation was published.
+    """
+    script = get_redis_connection("default").register_script(PUBLISH_SCRIPT)
+    previous = script(
+        keys=[cache.make_key(version_key(name)), cache.make_key(generation_key(name))],
+        args=[version, generation, CACHE_TIMEOUT],
+    )
+    if previous == -1:
+        logger.info(f"Discarding generation {generation} of {name}: data changed while it was built")
+        retire_generation(name, generation)
+        return False
+    previous = int(previous) if previous is not None else None
+    if previous is not None and previous != generation:
+        retire_generation(name, previous)
+        cache.set(previous_generation_key(name), previous, RETIRED_GENERATION_TIMEOUT)
+    logger.info(f"Published generation {generation} of {name}")
+    return True
+
+def publish_payload(name, payload, metadata, version):
+    """
+    Write a payload and its metadata as a new generation, then publish it
+    unless the data version has moved on from version
+    """
+    generation = new_generation(name)
+    metadata['generation'] = generation
+    set_cached_payload(generation_name(name, generation), payload, metadata)
+    publish_generation(name, generation, version)
+    return metadata
+
+@with_redis_retry
+def get_data_version(name):
+    """Current data version of a dataset, used to namespace derived cache entries"""
+    # Versions start from the clock so they never repeat after Redis is
+    # flushed; process-local copies are keyed by version and would go stale
+    initial = int(time.time())
+    cache.add(version_key(name), initial, None)
+    return cache.get(version_key(name), initial)
+
+@with_redis_retry
+def invalidate_dataset(name):
+    """
+    Drop the cached list of a dataset after its data changed and bump its
+    version, which orphans every derived entry (pages, query results).
+    """
+    # Seeded from the clock like get_data_version if the counter was flushed
+    # or evicted, so a version never repeats. Bumped before the pointer is
+    # dropped, so a rebuild still running on the old data can't publish
+    # after it
+    cache.add(version_key(name), int(time.time()), None)
+    version = cache.incr(version_key(name))
+    generation = cache.get(generation_key(name))
+    cache.delete(generation_key(name))
+    if generation is not None:
+        retire_generation(name, generation)
+        cache.set(previous_generation_key(name), generation, RETIRED_GENERATION_TIMEOUT)
+    logger.info(f"Invalidated {name} cache, now at version {version}")
+    return version
+
+def cache_chunks(name, queryset, serializer_class, chunk_size=1000, progress=None, compression=WARM_COMPRESSION):
+    """
+    Cache a dataset as zlib-compressed JSON array chunks, plus the full
+    pre-encoded payload assembled from the same bytes and the metadata
+    describing both. Only one chunk is ever rendered in memory at a time.
+    Everything is written under a new generation that is published only
+    once complete. progress(chunks, rows) is called after each chunk.
+    """
+    version = get_data_version(name)
+    generation = new_generation(name)
+    target = generation_name(name, generation)
+    plan = ValuesListSerializer(serializer_class)
+    encoder = PayloadEncoder(compression)
+    last_modified = queryset.aggregate(last_modified=Max('modified_at'))['last_modified']
+    total_chunks = 0
+    count = 0
+    batch = []
+
+    def flush():
+        nonlocal total_chunks, count
+        body = render_json(batch)
+        set_cache_data(chunk_key(target, total_chunks), zlib.compress(body))
+        # Splice the chunk's items into the full array: '[' a ',' b ... ']'
+        encoder.update(b',' if total_chunks else b'[')
+        encoder.update(body[1:-1])
+        total_chunks += 1
+        count += len(batch)
+        batch.clear()
+        if progress is not None:
+            progress(total_chunks, count)
+
+    for row in plan.iter_rows(queryset, chunk_size=chunk_size):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            flush()
+    if batch or not total_chunks:
+        flush()
+    encoder.update(b']')
+
+    payload, metadata = encoder.finish(
+        last_modified,
+        count=count,
+        total_chunks=total_chunks,
+        chunk_size=chunk_size,
+        last_updated=time.time(),
+        generation=generation,
+    )
+    set_cached_payload(target, payload, metadata)
+    publish_generation(name, generation, version)
+    logger.info(f"Cached {total_chunks} chunks ({count} rows) for {name}")
+    return metadata
+
+@with_redis_retry
+def get_cached_chunks(name, metadata):
+    """Fetch every chunk of a dataset in one MGET, or None if any has been evicted"""
+    keys = [chunk_key(name, index) for index in range(metadata['total_chunks'])]
+    chunks = cache.get_many(keys)
+    if len(chunks) != len(keys):
+        return None
+    return [chunks[key] for key in keys]
+
+def iter_chunked_json(chunks):
+    """Yield one JSON array from compressed array chunks, decompressing one chunk at a time"""
+    yield b'['
+    first = True
+    for compressed in chunks:
+        items = zlib.decompress(compressed)[1:-1]
+        if not items:
+            continue
+        if not first:
+            yield b','
+        yield items
+        first = False
+    yield b']'
+
+def get_warm_sources():
+    """
+    Dataset name -> (queryset, serializer class, chunked). Orderings match
+    the list endpoints so warmed chunks can be streamed as-is.
+    """
+    return {
+        'courses': (lazy.Course.objects.order_by('title'), lazy.CourseSerializer, True),
+        'professors': (lazy.Professor.objects.order_by('empirical_bayes_rank'), lazy.ProfessorSerializer, True),
+        'departments': (lazy.Department.objects.order_by('name'), lazy.DepartmentSerializer, False),
+    }
+
+def is_cache_current(name, queryset):
+    """
+    True if the published generation was built from the data currently in
+    the database (same row count and latest modified_at), so warming it
+    again would produce the same bytes.
+    """
+    target = get_current_name(name)
+    metadata = get_cached_metadata(target) if target else None
+    if not metadata or 'count' not in metadata:
+        return False
+    stats = queryset.order_by().aggregate(count=Count('id'), last_modified=Max('modified_at'))
+    last_modified = int(stats['last_modified'].timestamp()) if stats['last_modified'] else None
+    return metadata['count'] == stats['count'] and metadata.get('last_modified') == last_modified
+
+def warm_dataset(name, queryset, serializer_class, chunked, progress=None):
+    """Build and publish one dataset's cache from the database"""
+    if chunked:
+        return cache_chunks(
+            name, queryset, serializer_class, chunk_size=1000,
+            progress=(lambda chunks, rows: progress(name, chunks, rows)) if progress else None,
+        )
+    version = get_data_version(name)
+    stats = queryset.aggregate(last_modified=Max('modified_at'), count=Count('id'))
+    body = ValuesListSerializer(serializer_class).render(queryset)
+    metadata = publish_payload(name, *build_payload(body, stats['last_modified'], WARM_COMPRESSION, count=stats['count']), version)
+    if progress is not None:
+        progress(name, 1, stats['count'])
+    return metadata
+
+def warm_cache(datasets=None, force=False, progress=None):
+    """
+    Warm up the cache with all necessary data. Only one process warms at a
+    time; datasets whose published cache is still current are skipped
+    unless force is set. Returns {name: 'warmed' | 'current'}, or None if
+    another process holds the warming lock.
+    """
+    if not acquire_lock("cache_warming", timeout=WARM_LOCK_TIMEOUT):
+        logger.info("Another process is warming the cache, skipping...")
+        return None
+
+    results = {}
+    try:
         logger.info("Starting cache warming process...")
         start_time = time.time()
-        cache.set('cache_warming_in_progress', True, LOCK_TIMEOUT)
 
-        with transaction.atomic():
-            try:
-                def cache_with_compression(model, serializer_class, cache_key, chunk_size=100):
-                    """Cache data in chunks to prevent memory overload"""
-                    total_count = 0
-                    try:
-                        for chunk_index, chunk in enumerate(model.objects.iterator(chunk_size=chunk_size)):
-                            chunk_data = serializer_class(chunk).data
-                            # Cache each chunk separately with compression
-                            json_data = json.dumps(chunk_data, cls=DjangoJSONEncoder)
-                            compressed = zlib.compress(json_data.encode('utf-8'))
-                            set_cache_data(f'{cache_key}_chunk_{chunk_index}', compressed)
-                            total_count += 1
-                            
-                        # Store metadata about the chunks
-                        set_cache_data(f'{cache_key}_metadata', {
-                            'total_chunks': total_count,
-                            'chunk_size': chunk_size,
-                            'last_updated': time.time()
-                        })
-                        logger.info(f"Cached {total_count} chunks for {cache_key}")
-                    except Exception as e:
-                        logger.error(f"Error caching chunks for {cache_key}: {str(e)}")
-                        raise
-
-                # Cache data with compression
-                cache_with_compression(lazy.Course, lazy.CourseSerializer, 'courses_data', chunk_size=1000)
-                cache_with_compression(lazy.Professor, lazy.ProfessorSerializer, 'professors_data', chunk_size=1000)
-                
-                departments = lazy.Department.objects.select_related().all()
-                departments_data = lazy.DepartmentSerializer(departments, many=True).data
-                set_cache_data('departments_data', departments_data)
-
-            except Exception as e:
-                logger.error(f"Error during cache warming: {str(e)}")
-                raise
+        sources = get_warm_sources()
+        for name in datasets or sources:
+            queryset, serializer_class, chunked = sources[name]
+            # One snapshot per dataset, so its chunks and metadata agree
+            with transaction.atomic():
+                if not force and is_cache_current(name, queryset):
+                    logger.info(f"Cache for {name} is current, skipping")
+                    results[name] = 'current'
+                    continue
+                warm_dataset(name, queryset, serializer_class, chunked, progress)
+            results[name] = 'warmed'
 
         set_cache_data('cache_warmed', True)
         set_cache_data('last_cache_update', time.time())
         logger.info(f"Cache warming completed in {time.time() - start_time:.2f} seconds")
-        
+        return results
+
     except Exception as e:
         logger.error(f"Error during cache warming: {str(e)}")
         raise
     finally:
-        cache.delete('cache_warming_in_progress')
         release_lock("cache_warming")
-
-def get_cached_data(key):
-    """Get data from cache with lazy loading fallback"""
-    try:
-        logger.info(f"Getting cached data for {key}")
-        data = cache.get(key)
-        
-        if data is None and not cache.get('cache_warmed'):
-            if is_cache_warming():
-                logger.info("Cache is being warmed, waiting...")
-                time.sleep(0.5)
-                data = cache.get(key)
-            else:
-                logger.warning(f"Cache miss for {key}, warming cache...")
-                warm_cache()
-                data = cache.get(key)
-
-        if data is None:
-            logger.warning(f"Cache miss for {key} after warming attempt")
-            with transaction.atomic():
-                chunk_size = 100
-                all_data = []
-                
-                if key == 'courses_data':
-                    chunk_size = 50
-                    for chunk in lazy.Course.objects.select_related().iterator(chunk_size=chunk_size):
-                        all_data.append(lazy.CourseSerializer(chunk).data)
-                elif key == 'professors_data':
-                    for chunk in lazy.Professor.objects.select_related().iterator(chunk_size=chunk_size):
-                        all_data.append(lazy.ProfessorSerializer(chunk).data)
-                elif key == 'departments_data':
-                    departments = lazy.Department.objects.select_related().all()
-                    all_data = lazy.DepartmentSerializer(departments, many=True).data
-                
-                if all_data:
-                    set_cache_data(key, all_data)
-                    data = all_data
-
-        return data or []
-    except Exception as e:
-        logger.error(f"Error getting cached data for {key}: {str(e)}")
-        return []
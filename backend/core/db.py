@@ -0,0 +1,25 @@
+from django.db import connection
+from django.db.utils import InterfaceError, OperationalError
+from functools import wraps
+import logging
+
+logger = logging.getLogger(__name__)
+
+def with_db_retry(func):
+    """
+    Retry once on a fresh connection if the persistent one turned out to be
+    dead (database restart, idle timeout on the host, network blip).
+    Connections are otherwise kept for CONN_MAX_AGE and health-checked by
+    Django, instead of being closed and re-established on every request.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except (OperationalError, InterfaceError) as e:
+            if connection.in_atomic_block:
+                raise  # Retrying can't help inside a broken transaction
+            logger.warning(f"Database connection failed, retrying on a new one: {str(e)}")
+            connection.close()
+            return func(*args, **kwargs)
+    return wrapper
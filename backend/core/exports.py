@@ -0,0 +1,176 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Count, Max
+from core.cache_utils import get_data_version, hold_lock, lazy
+from core.serializers import ValuesListSerializer
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # exports are unavailable without pyarrow
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'arrow': 'application/vnd.apache.arrow.file',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+EXPORT_DATASETS = ('courses', 'professors', 'departments')
+
+class ExportUnavailable(Exception):
+    """Raised when pyarrow isn't installed"""
+
+def get_source(name):
+    """(queryset, serializer_class) backing an exported dataset"""
+    sources = {
+        'courses': (lazy.Course.objects.order_by('id'), lazy.CourseSerializer),
+        'professors': (lazy.Professor.objects.order_by('id'), lazy.ProfessorSerializer),
+        'departments': (lazy.Department.objects.order_by('id'), lazy.DepartmentSerializer),
+    }
+    return sources[name]
+
+def get_data_fingerprint(queryset):
+    """
+    Identify the current data version from the database itself, so exports
+    stay correct even if Redis is flushed. Imports always touch modified_at.
+    """
+    stats = queryset.order_by().aggregate(count=Count('id'), max_id=Max('id'), last_modified=Max('modified_at'))
+    last_modified = stats['last_modified'].isoformat() if stats['last_modified'] else ''
+    return hashlib.md5(f"{stats['count']}:{stats['max_id']}:{last_modified}".encode()).hexdigest()[:16]
+
+def export_path(name, fingerprint, fmt):
+    return os.path.join(settings.EXPORT_ROOT, f'{name}-{fingerprint}.{fmt}')
+
+def manifest_path(name):
+    return os.path.join(settings.EXPORT_ROOT, f'{name}.json')
+
+def read_manifest(name):
+    """{'fingerprint', 'version'} of the export last written for a dataset, or None"""
+    try:
+        with open(manifest_path(name)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def write_manifest(name, fingerprint, version):
+    """Record which export files match which data version, atomically"""
+    fd, tmp_path = tempfile.mkstemp(dir=settings.EXPORT_ROOT, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'fingerprint': fingerprint, 'version': version}, f)
+    os.replace(tmp_path, manifest_path(name))
+
+def arrow_type(model_field):
+    """Arrow type for a model field; anything unrecognised is exported as a string"""
+    if isinstance(model_field, (models.AutoField, models.BigAutoField, models.IntegerField)):
+        return pa.int64()
+    if isinstance(model_field, models.FloatField):
+        return pa.float64()
+    if isinstance(model_field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(model_field, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC')
+    return pa.string()
+
+def build_table(name):
+    """Load a dataset into a typed Arrow table with the same columns as the API"""
+    queryset, serializer_class = get_source(name)
+    plan = ValuesListSerializer(serializer_class)
+    model = queryset.model
+    schema = pa.schema([
+        pa.field(column, arrow_type(model._meta.get_field(column)))
+        for column in plan.columns
+    ])
+    # Raw values_list rows keep native types (datetimes, not ISO strings)
+    rows = list(queryset.values_list(*plan.columns))
+    columns = [list(column) for column in zip(*rows)] if rows else [[] for _ in plan.columns]
+    return pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+def write_export(name, fingerprint):
+    """Write Arrow IPC and Parquet files for one data version, atomically"""
+    table = build_table(name)
+    os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+    paths = {}
+    for fmt in EXPORT_FORMATS:
+        path = export_path(name, fingerprint, fmt)
+        fd, tmp_path = tempfile.mkstemp(dir=settings.EXPORT_ROOT, suffix='.tmp')
+        os.close(fd)
+        try:
+            if fmt == 'arrow':
+                with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            else:
+                pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        paths[fmt] = path
+    prune_exports(name, fingerprint)
+    logger.info(f"Exported {table.num_rows} {name} rows as version {fingerprint}")
+    return paths
+
+def prune_exports(name, keep_fingerprint):
+    """Remove files left over from older data versions"""
+    for filename in os.listdir(settings.EXPORT_ROOT):
+        if filename.startswith(f'{name}-') and not filename.startswith(f'{name}-{keep_fingerprint}.'):
+            try:
+                os.unlink(os.path.join(settings.EXPORT_ROOT, filename))
+            except FileNotFoundError:
+                pass
+
+def generate_export(name, force=False):
+    """
+    Write the export files for the current data version, unless they
+    already exist (or force is set), holding the export lock for the whole
+    build. Returns the fingerprint, or None if another process is
+    exporting the dataset. Only export_datasets calls this; requests never
+    build an export.
+    """
+    if pa is None:
+        raise ExportUnavailable('pyarrow is not installed')
+
+    with hold_lock(f'export_{name}') as acquired:
+        if not acquired:
+            return None
+        # Read before the data, so an import that lands mid-build leaves the
+        # manifest on the old version and requests re-check the fingerprint
+        version = get_data_version(name)
+        queryset, _ = get_source(name)
+        fingerprint = get_data_fingerprint(queryset)
+        if force or not all(os.path.exists(export_path(name, fingerprint, fmt)) for fmt in EXPORT_FORMATS):
+            write_export(name, fingerprint)
+        write_manifest(name, fingerprint, version)
+        return fingerprint
+
+def get_current_export(name):
+    """
+    Fingerprint of the export generated for the current data version, or
+    None if there isn't one yet. A request only reads the manifest and the
+    data version; the database fingerprint is computed only when the
+    version moved since the export was written (an import, or a Redis
+    flush), to tell whether the data actually changed.
+    """
+    if pa is None:
+        raise ExportUnavailable('pyarrow is not installed')
+
+    manifest = read_manifest(name)
+    if manifest is None:
+        return None
+    version = get_data_version(name)
+    if manifest['version'] != version:
+        queryset, _ = get_source(name)
+        if get_data_fingerprint(queryset) != manifest['fingerprint']:
+            return None
+        write_manifest(name, manifest['fingerprint'], version)
+    return manifest['fingerprint']
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.exports import EXPORT_DATASETS, EXPORT_FORMATS, ExportUnavailable, export_path, generate_export
+import os
+
+class Command(BaseCommand):
+    help = 'Export datasets as Arrow IPC and Parquet files for the current data version'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', action='append', choices=EXPORT_DATASETS, help='Dataset to export (repeatable, default: all)')
+        parser.add_argument('--force', action='store_true', help='Rewrite the files even if this version was already exported')
+
+    def handle(self, *args, **options):
+        for name in options['dataset'] or EXPORT_DATASETS:
+            try:
+                fingerprint = generate_export(name, force=options['force'])
+            except ExportUnavailable as e:
+                raise CommandError(str(e))
+            if fingerprint is None:
+                self.stdout.write(self.style.WARNING(f'{name}: another process is exporting, skipping'))
+                continue
+
+            for fmt in EXPORT_FORMATS:
+                path = export_path(name, fingerprint, fmt)
+                self.stdout.write(self.style.SUCCESS(f'{name} ({fmt}): {path} ({os.path.getsize(path)} bytes)'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from core.cache_utils import get_warm_sources, warm_cache
+
+class Command(BaseCommand):
+    help = 'Warm the list caches, skipping datasets whose cache is already current'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', action='append', choices=list(get_warm_sources()), help='Dataset to warm (repeatable, default: all)')
+        parser.add_argument('--force', action='store_true', help='Rebuild even if the cached data is current')
+
+    def handle(self, *args, **options):
+        def progress(name, chunks, rows):
+            self.stdout.write(f'{name}: {rows} rows cached ({chunks} chunks)')
+
+        results = warm_cache(datasets=options['dataset'], force=options['force'], progress=progress)
+        if results is None:
+            self.stdout.write(self.style.WARNING('Another process is warming the cache, skipping'))
+            return
+
+        for name, result in results.items():
+            if result == 'current':
+                self.stdout.write(f'{name}: cache is current, skipped')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: warmed'))
@@ -1,14 +1,18 @@
-from django.http import JsonResponse
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.http import HttpResponse, JsonResponse
 from django.conf import settings
-from django.core.cache import cache
-import time
+from django.core import signing
+from core.ratelimit import Limit
+from core.telemetry import telemetry
+from core.throttling import evaluate_throttles
 import logging
-from django.urls import resolve
+import time
+from django.urls import Resolver404, resolve
+from rest_framework.views import APIView
 import secrets
 
 # Set up loggers
 security_logger = logging.getLogger('security')
-api_logger = logging.getLogger('api')
 
 class RateLimitMiddleware:
     def __init__(self, get_response):
@@ -17,28 +21,15 @@ class RateLimitMiddleware:
         self.window = 60  # seconds
 
     def __call__(self, request):
-        # Log all headers for debugging
-        api_logger.info(
-            'Request Headers',
-            extra={
-                'headers': dict(request.headers),
-                'method': request.method,
-                'path': request.path
-            }
-        )
-
         if request.method not in ['OPTIONS', 'HEAD'] and request.path.startswith('/api/'):
             ip = self.get_client_ip(request)
-            key = f'rate_limit:{ip}'
-            
-            # Get the current request count
-            requests = cache.get(key, [])
-            now = time.time()
-            
-            # Filter out requests older than our window
-            requests = [req for req in requests if now - req < self.window]
-            
-            if len(requests) >= self.rate_limit:
+
+            # The per-IP limit and all of the view's DRF throttles in one call
+            limit = Limit(f'rate_limit:{ip}', self.rate_limit, self.window)
+            view, throttles = self.get_view_throttles(request)
+            result = evaluate_throttles(request, view, throttles, extra_limits=[limit])[limit.key]
+
+            if not result.allowed:
                 # Log rate limit exceeded
                 security_logger.warning(
                     'Rate limit exceeded',
@@ -46,24 +37,22 @@ class RateLimitMiddleware:
                         'ip': ip,
                         'path': request.path,
                         'user': 'anonymous',  # Simplified as we don't need user info for rate limit logging
-                        'request_count': len(requests)
+                        'request_count': int(result.count)
                     }
                 )
-                return HttpResponse("Rate limit exceeded. Please try again later.", status=429)
-            
-            # Add the current request and update the cache
-            requests.append(now)
-            cache.set(key, requests, self.window)
-            
+                response = HttpResponse("Rate limit exceeded. Please try again later.", status=429)
+                response['Retry-After'] = str(int(result.retry_after) + 1)
+                return response
+
             # Log if approaching rate limit
-            if len(requests) > self.rate_limit * 0.8:  # 80% of limit
+            if result.count > self.rate_limit * 0.8:  # 80% of limit
                 security_logger.warning(
                     'Approaching rate limit',
                     extra={
                         'ip': ip,
                         'path': request.path,
                         'user': 'anonymous',  # Simplified as we don't need user info for rate limit logging
-                        'request_count': len(requests)
+                        'request_count': int(result.count)
                     }
                 )
         
@@ -75,7 +64,7 @@ class RateLimitMiddleware:
             if origin and (settings.DEBUG or origin in getattr(settings, 'CORS_ALLOWED_ORIGINS', [])):
                 response['Access-Control-Allow-Origin'] = origin
                 response['Access-Control-Allow-Credentials'] = 'true'
-                response['Access-Control-Expose-Headers'] = 'last-modified'
+                response['Access-Control-Expose-Headers'] = 'etag, last-modified'
                 
                 # Add cache control headers - allow caching but require revalidation
                 response['Cache-Control'] = 'no-cache, must-revalidate'
@@ -88,6 +77,18 @@ class RateLimitMiddleware:
         
         return response
     
+    def get_view_throttles(self, request):
+        """(view, throttles) for the DRF view the request resolves to, or (None, [])"""
+        try:
+            view_func = resolve(request.path_info).func
+        except Resolver404:
+            return None, []
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None or not issubclass(view_class, APIView):
+            return None, []
+        view = view_class(**getattr(view_func, 'initkwargs', {}))
+        return view, view.get_throttles()
+
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
@@ -95,37 +96,129 @@ class RateLimitMiddleware:
         return request.META.get('REMOTE_ADDR')
 
 class SessionTokenMiddleware:
+    """
+    Issue an X-Session-Token on the first API request and require it after.
+
+    SESSION_TOKEN_MODE = 'session' keeps the token in the (cache-backed)
+    session. 'signed' issues a TimestampSigner-signed token instead, which
+    is checked without touching the session store at all.
+
+    Runs natively under both WSGI and ASGI, so the async views don't pay for
+    a thread hop here; only the session lookup is pushed to a thread.
+    """
+    sync_capable = True
+    async_capable = True
+    token_salt = 'core.middleware.SessionTokenMiddleware'
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.mode = getattr(settings, 'SESSION_TOKEN_MODE', 'session')
+        self.max_age = getattr(settings, 'SESSION_TOKEN_MAX_AGE', 86400)
+        self.signer = signing.TimestampSigner(salt=self.token_salt)
 
     def __call__(self, request):
-        # Allow OPTIONS requests to pass through without token check
-        if request.method == 'OPTIONS':
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.applies(request):
             return self.get_response(request)
 
-        if request.path.startswith('/api/'):
-            # Skip token validation for the first request
-            is_first_request = not request.headers.get('X-Session-Token')
-            session_token = request.session.get('api_token')
-
-            if is_first_request:
-                # Generate new token if none exists
-                if not session_token:
-                    session_token = secrets.token_urlsafe(32)
-                    request.session['api_token'] = session_token
-                    request.session.set_expiry(86400)  # 24 hours
-            else:
-                # Validate token for subsequent requests
-                request_token = request.headers.get('X-Session-Token')
-                if not request_token or request_token != session_token:
-                    return JsonResponse({'error': 'Invalid session token'}, status=401)
+        session_token = self.check_token(request)
+        if session_token is None:
+            return self.invalid_token_response()
+        return self.add_token(self.get_response(request), session_token)
+
+    async def __acall__(self, request):
+        if not self.applies(request):
+            return await self.get_response(request)
+
+        if self.mode == 'signed':
+            session_token = self.check_token(request)
+        else:
+            # The session store is sync-only
+            session_token = await sync_to_async(self.check_token)(request)
+        if session_token is None:
+            return self.invalid_token_response()
+        return self.add_token(await self.get_response(request), session_token)
+
+    def applies(self, request):
+        # Allow OPTIONS requests to pass through without token check
+        return request.method != 'OPTIONS' and request.path.startswith('/api/')
+
+    def check_token(self, request):
+        """The token to send back with the response, or None if the request's token is invalid"""
+        request_token = request.headers.get('X-Session-Token')
+
+        if self.mode == 'signed':
+            if not request_token:
+                return self.signer.sign(secrets.token_urlsafe(16))
+            try:
+                self.signer.unsign(request_token, max_age=self.max_age)
+            except signing.BadSignature:  # Also raised for expired tokens
+                return None
+            return request_token
 
+        session_token = request.session.get('api_token')
+        if not request_token:
+            # Skip token validation for the first request, generating a token if none exists
+            if not session_token:
+                session_token = secrets.token_urlsafe(32)
+                request.session['api_token'] = session_token
+                request.session.set_expiry(86400)  # 24 hours
+            return session_token
+        if request_token != session_token:
+            return None
+        return session_token
+
+    def invalid_token_response(self):
+        return JsonResponse({'error': 'Invalid session token'}, status=401)
+
+    def add_token(self, response, session_token):
+        response['X-Session-Token'] = session_token
+        # Add CORS headers specifically for the token
+        # No trailing ", " when there is nothing to append: h11 (uvicorn) rejects the header
+        exposed = response.get('Access-Control-Expose-Headers')
+        response['Access-Control-Expose-Headers'] = f'X-Session-Token, {exposed}' if exposed else 'X-Session-Token'
+        return response
+
+class TelemetryMiddleware:
+    """Feed per-route latency and size counters, and log full details for a sample of requests"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
         response = self.get_response(request)
-        
-        # Add token to response headers for all API requests
-        if request.path.startswith('/api/'):
-            response['X-Session-Token'] = request.session['api_token']
-            # Add CORS headers specifically for the token
-            response['Access-Control-Expose-Headers'] = 'X-Session-Token, ' + response.get('Access-Control-Expose-Headers', '')
-        
-        return response
\ No newline at end of file
+        self.record(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        # In-memory counters only, cheap enough to update on the event loop
+        self.record(request, response, started)
+        return response
+
+    def record(self, request, response, started):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else 'unresolved'
+        if response.streaming:
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+        telemetry.record(request.method, route, response.status_code, elapsed_ms, size)
+
+        if telemetry.should_sample():
+            telemetry.log_sample(request, response.status_code, elapsed_ms)
@@ -0,0 +1,135 @@
+"""
+Constant-memory rate limiting on Redis.
+
+Every limit is a sliding window counter: requests are counted with INCR in
+fixed windows, and the count over the trailing window is estimated from the
+current window plus the previous one, weighted by how much of it still
+overlaps. That is two integers per client and limit, and any number of
+limits are checked in a single round-trip by a small Lua script that only
+counts a request if every limit allows it, so a blocked client doesn't
+extend its own lockout, or use up its other limits, by retrying.
+"""
+from django.core.cache import cache
+from django_redis import get_redis_connection
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# KEYS: current, previous window key per limit. ARGV: now, then limit, window per limit.
+# Returns {fits, current count, previous count} per limit; the request is only
+# counted, against every limit, if it fits under all of them.
+CHECK_SCRIPT = """
+local now = tonumber(ARGV[1])
+local results = {}
+local allowed = true
+for i = 1, #KEYS / 2 do
+    local limit = tonumber(ARGV[i * 2])
+    local window = tonumber(ARGV[i * 2 + 1])
+    local current = tonumber(redis.call('GET', KEYS[i * 2 - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[i * 2]) or '0')
+    local remaining = 1 - (now % window) / window
+    if current + 1 + previous * remaining <= limit then
+        results[i] = {1, current, previous}
+    else
+        results[i] = {0, current, previous}
+        allowed = false
+    end
+end
+if allowed then
+    for i = 1, #KEYS / 2 do
+        results[i][2] = redis.call('INCR', KEYS[i * 2 - 1])
+        redis.call('EXPIRE', KEYS[i * 2 - 1], tonumber(ARGV[i * 2 + 1]) * 2)
+    end
+end
+return results
+"""
+
+class Limit:
+    """At most `limit` requests per `window` seconds for one client key"""
+    def __init__(self, key, limit, window):
+        self.key = key
+        self.limit = limit
+        self.window = window
+
+    def window_keys(self, now):
+        index = int(now // self.window)
+        return (
+            cache.make_key(f'ratelimit:{self.key}:{index}'),
+            cache.make_key(f'ratelimit:{self.key}:{index - 1}'),
+        )
+
+    def retry_after(self, current, previous, now):
+        """Seconds until the weighted estimate has room for one more request"""
+        elapsed = (now % self.window) / self.window
+        room = self.limit - 1
+        if current <= room and previous:
+            # Room opens up within this window as the previous one's weight decays
+            return max(0.0, self.window * (1 - elapsed - (room - current) / previous))
+        # Not before the window rolls over, and then only once this window's
+        # count, now the previous one, has decayed enough
+        decay = 1 - room / current if current else 1
+        return self.window * (1 - elapsed) + self.window * max(0.0, decay)
+
+class LimitResult:
+    def __init__(self, limit, count, retry_after=None):
+        self.limit = limit
+        self.count = count
+        self.retry_after = retry_after
+
+    @property
+    def allowed(self):
+        return self.retry_after is None
+
+def script_arguments(limits, now):
+    """KEYS and ARGV for CHECK_SCRIPT"""
+    keys = []
+    args = [now]
+    for limit in limits:
+        keys.extend(limit.window_keys(now))
+        args.extend((limit.limit, limit.window))
+    return keys, args
+
+def read_limits(limits, replies, now):
+    """Turn the replies of CHECK_SCRIPT into a LimitResult per limit"""
+    results = []
+    for limit, (allowed, current, previous) in zip(limits, replies):
+        count = int(current) + int(previous) * (1 - (now % limit.window) / limit.window)
+        if allowed:
+            results.append(LimitResult(limit, count))
+        else:
+            results.append(LimitResult(limit, count, retry_after=limit.retry_after(int(current), int(previous), now)))
+    return results
+
+def check_limits(limits, now=None):
+    """
+    Count one request against every limit if all of them allow it, and
+    return a LimitResult per limit, in order. If Redis is unreachable every request
+    is allowed: losing rate limiting for a moment is better than failing the API.
+    """
+    if not limits:
+        return []
+    now = time.time() if now is None else now
+
+    try:
+        client = get_redis_connection('default')
+        keys, args = script_arguments(limits, now)
+        replies = client.register_script(CHECK_SCRIPT)(keys=keys, args=args)
+    except Exception as e:
+        logger.warning(f"Rate limit check failed, allowing request: {str(e)}")
+        return [LimitResult(limit, 0) for limit in limits]
+    return read_limits(limits, replies, now)
+
+async def acheck_limits(client, limits, now=None):
+    """check_limits for async views, on a redis.asyncio client"""
+    if not limits:
+        return []
+    now = time.time() if now is None else now
+
+    try:
+        keys, args = script_arguments(limits, now)
+        replies = await client.register_script(CHECK_SCRIPT)(keys=keys, args=args)
+    except Exception as e:
+        logger.warning(f"Rate limit check failed, allowing request: {str(e)}")
+        return [LimitResult(limit, 0) for limit in limits]
+    return read_limits(limits, replies, now)
@@ -0,0 +1,9 @@
+from rest_framework.renderers import JSONRenderer
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    Selected with ?format=columnar. Views that support the columnar layout
+    check for it and render their own struct-of-arrays payload; any other
+    response under this format is plain JSON.
+    """
+    format = 'columnar'
@@ -0,0 +1,127 @@
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import compress_sequence
+import gzip
+import hashlib
+import zlib
+
+# Preferred order when the client accepts more than one encoding
+PREFERRED_ENCODINGS = ('br', 'gzip')
+
+def accepted_encodings(request):
+    """Return the set of content codings the client accepts (q=0 means refused)"""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    return accepted
+
+def payload_response(request, payload, content_type='application/json', status=200):
+    """
+    Serve a payload built by cache_utils.build_payload or a PayloadEncoder
+    as-is, picking the best encoding the client accepts. Clients that accept
+    neither get the gzip body decompressed, which is rare enough not to be
+    worth caching.
+    """
+    accepted = accepted_encodings(request)
+    for encoding in PREFERRED_ENCODINGS:
+        if encoding in payload and (encoding in accepted or '*' in accepted):
+            response = HttpResponse(payload[encoding], content_type=content_type, status=status)
+            response['Content-Encoding'] = encoding
+            break
+    else:
+        response = HttpResponse(gzip.decompress(payload['gzip']), content_type=content_type, status=status)
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+def body_response(request, body, content_type='application/json'):
+    """
+    Serve a body rendered for this request only: gzipped at the fastest
+    level when the client accepts it, with an ETag so repeats can still be
+    answered with a 304. Nothing is stored.
+    """
+    # Weak like the cached payloads' ETags: gzipped or not, it's the same body
+    metadata = {'etag': 'W/"%s"' % hashlib.md5(body).hexdigest()}
+    response = not_modified_response(request, metadata)
+    if response is not None:
+        return response
+
+    accepted = accepted_encodings(request)
+    if 'gzip' in accepted or '*' in accepted:
+        response = HttpResponse(gzip.compress(body, compresslevel=1), content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(body, content_type=content_type)
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return apply_validators(response, metadata)
+
+def streaming_response(request, iterator, content_type='application/json'):
+    """
+    Stream a body piece by piece, gzipping on the fly when the client accepts
+    it. Used when only the chunked form of a dataset is cached.
+    """
+    accepted = accepted_encodings(request)
+    if 'gzip' in accepted or '*' in accepted:
+        response = StreamingHttpResponse(compress_sequence(iterator), content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(iterator, content_type=content_type)
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+def async_streaming_response(request, aiterator, content_type='application/json'):
+    """streaming_response for async iterators, served without a thread under ASGI"""
+    accepted = accepted_encodings(request)
+    if 'gzip' in accepted or '*' in accepted:
+        response = StreamingHttpResponse(acompress_sequence(aiterator), content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(aiterator, content_type=content_type)
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+async def acompress_sequence(aiterator):
+    """Gzip an async byte iterator piece by piece, like compress_sequence"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for item in aiterator:
+        data = compressor.compress(item)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def apply_validators(response, metadata):
+    """Set ETag and Last-Modified from cache-build metadata"""
+    response['ETag'] = metadata['etag']
+    if metadata.get('last_modified'):
+        response['Last-Modified'] = http_date(metadata['last_modified'])
+    return response
+
+def not_modified_response(request, metadata):
+    """
+    Return a 304 if the client's validators still match, otherwise None.
+    If-None-Match is compared weakly, so any encoding's copy revalidates.
+    """
+    response = get_conditional_response(
+        request,
+        etag=metadata['etag'],
+        last_modified=metadata.get('last_modified'),
+    )
+    if response is None:
+        return None
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return apply_validators(response, metadata)
@@ -0,0 +1,114 @@
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+import re
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder gives the same bytes
+    orjson = None
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer that takes an optional `fields` argument restricting
+    which fields are serialized, in the serializer's declared order.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+# Serializer fields whose to_representation is a no-op on the value the DB driver returns
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.FloatField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+)
+
+# Numbers orjson formats differently from json.dumps (below 1e-4 or from 1e16 up)
+ORJSON_MISMATCH = re.compile(rb'[:,\[]-?(?:0\.0000\d|\d+(?:\.\d+)?e)')
+
+def render_json(data):
+    """
+    Render data to the exact bytes DRF's JSONRenderer produces, using orjson
+    when it is installed and its output is known to be identical.
+    """
+    if orjson is not None:
+        body = orjson.dumps(data)
+        if not ORJSON_MISMATCH.search(body):
+            # JSONRenderer escapes these two so the output is valid JavaScript
+            return body.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+    return JSONRenderer().render(data)
+
+class ValuesListSerializer:
+    """
+    Bulk serializer producing the same data as a ModelSerializer, but from
+    values_list() rows instead of model instances. The column plan (which
+    columns to select and which fields need converting) is computed once
+    from the serializer's fields; most columns are passed through untouched.
+    """
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class(fields=fields)
+        self.names = []
+        self.columns = []
+        self.converters = []
+        for index, (name, field) in enumerate(serializer.fields.items()):
+            if field.source == '*' or '.' in field.source:
+                raise ValueError(f'{serializer_class.__name__}.{name} is not a plain model column')
+            self.names.append(name)
+            self.columns.append(field.source)
+            if not isinstance(field, PASSTHROUGH_FIELDS):
+                self.converters.append((index, field.to_representation))
+
+    def iter_values(self, queryset, chunk_size=2000):
+        """Yield each row's serialized values in column order"""
+        converters = self.converters
+        for row in queryset.values_list(*self.columns).iterator(chunk_size=chunk_size):
+            if converters:
+                row = list(row)
+                for index, convert in converters:
+                    if row[index] is not None:
+                        row[index] = convert(row[index])
+            yield row
+
+    def iter_rows(self, queryset, chunk_size=2000):
+        names = self.names
+        for row in self.iter_values(queryset, chunk_size=chunk_size):
+            yield dict(zip(names, row))
+
+    def serialize(self, queryset):
+        return list(self.iter_rows(queryset))
+
+    def render(self, queryset):
+        return render_json(self.serialize(queryset))
+
+    def serialize_columnar(self, queryset, dictionary_fields=()):
+        """
+        Struct-of-arrays form: one array per column instead of one object per
+        row, so key names are sent once. Columns in dictionary_fields hold
+        indexes into a per-column list of distinct values (nulls stay null).
+        """
+        rows = list(self.iter_values(queryset))
+        columns = [list(column) for column in zip(*rows)] if rows else [[] for _ in self.names]
+        dictionaries = {}
+        for index, name in enumerate(self.names):
+            if name not in dictionary_fields:
+                continue
+            codes = {}
+            columns[index] = [
+                None if value is None else codes.setdefault(value, len(codes))
+                for value in columns[index]
+            ]
+            dictionaries[name] = list(codes)
+        return {
+            'count': len(rows),
+            'columns': self.names,
+            'dictionaries': dictionaries,
+            'data': columns,
+        }
+
+    def render_columnar(self, queryset, dictionary_fields=()):
+        return render_json(self.serialize_columnar(queryset, dictionary_fields))
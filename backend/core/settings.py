@@ -59,6 +59,9 @@ CORS_EXPOSE_HEADERS = [
     'cache-control',
     'last-modified',
     'x-session-token',  # Add this line
+    'x-total-count',
+    'x-data-version',
+    'x-payload-size',
 ]
 CORS_ALLOW_HEADERS = [
     'accept',
@@ -94,6 +97,7 @@ CORS_ALLOW_METHODS = [
 # Base middleware - same for both production and development
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # CORS first
+    'core.middleware.TelemetryMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -204,6 +208,12 @@ HEALTH_CHECK = {
     'cache_timeout': 30,
 }
 
+# Serve plain list GETs from async views; only useful under ASGI (uvicorn workers, see gunicorn.conf.py)
+ASYNC_API = config('ASYNC_API', default=False, cast=bool)
+
+# Per-process copy of hot cached payloads, so most requests skip the Redis transfer
+L1_CACHE_MAX_BYTES = config('L1_CACHE_MAX_BYTES', default=32 * 1024 * 1024, cast=int)
+
 # Don't cache CORS preflight requests
 CACHE_MIDDLEWARE_SECONDS = 60 * 60 * 24  # 24 hours
 CACHE_MIDDLEWARE_KEY_PREFIX = 'qguideguide'
@@ -241,8 +251,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework_datatables.pagination.DatatablesPageNumberPagination',
     'PAGE_SIZE': 50,
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'core.throttling.AnonRateThrottle',
+        'core.throttling.UserRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '200/hour',  
@@ -262,6 +272,11 @@ SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_AGE = 86400  # 24 hours
 
+# 'session' stores the X-Session-Token in the session; 'signed' issues
+# self-validating signed tokens that need no session lookup per request
+SESSION_TOKEN_MODE = config('SESSION_TOKEN_MODE', default='session')
+SESSION_TOKEN_MAX_AGE = 86400  # 24 hours, same as the session-backed token
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -289,7 +304,9 @@ WSGI_APPLICATION = 'core.wsgi.application'
 DATABASES = {
     'default': dj_database_url.config(
         default=config('DATABASE_URL'),
-        conn_max_age=600,
+        # Persistent connections are per thread, and under ASGI every sync_to_async
+        # call may land on a fresh thread, leaking a connection each time
+        conn_max_age=0 if ASYNC_API else 600,
         conn_health_checks=True,
     )
 }
@@ -330,6 +347,9 @@ STATIC_ROOT = None
 STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
 STATICFILES_DIRS = []  # Empty list since we don't use static files
 
+# Arrow / Parquet exports are written here, one file per dataset version
+EXPORT_ROOT = config('EXPORT_ROOT', default=str(BASE_DIR / 'exports'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -364,9 +384,18 @@ LOGGING = {
             'handlers': ['console'],
             'level': 'DEBUG',
         },
+        'telemetry': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
+# Access telemetry: fraction of requests logged in full, and how often route counters are written out
+TELEMETRY_SAMPLE_RATE = config('TELEMETRY_SAMPLE_RATE', default=0.01, cast=float)
+TELEMETRY_FLUSH_INTERVAL = config('TELEMETRY_FLUSH_INTERVAL', default=60, cast=int)
+
 # Ensure the logs directory exists
 import os
 if not os.path.exists('logs'):
@@ -0,0 +1,104 @@
+"""
+Lightweight access telemetry.
+
+Per-route request counts, latency and response sizes are aggregated in
+process memory and written out as one structured log line per route every
+TELEMETRY_FLUSH_INTERVAL seconds. Full request diagnostics (headers, client)
+are only logged for a TELEMETRY_SAMPLE_RATE fraction of requests, so the
+per-request cost is a dict update rather than a log record.
+"""
+from django.conf import settings
+import json
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger('telemetry')
+
+# Never written to logs, even for sampled requests
+REDACTED_HEADERS = {'authorization', 'cookie', 'x-session-token', 'x-csrftoken'}
+
+class RouteStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.total_bytes = 0
+
+    def add(self, status, elapsed_ms, size):
+        self.count += 1
+        if status >= 500:
+            self.errors += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.total_bytes += size
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total_ms / self.count, 2),
+            'max_ms': round(self.max_ms, 2),
+            'avg_bytes': self.total_bytes // self.count,
+        }
+
+class Telemetry:
+    def __init__(self, sample_rate, flush_interval):
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.routes = {}
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def should_sample(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def record(self, method, route, status, elapsed_ms, size):
+        """Add one request to the route's counters, flushing if the interval has passed"""
+        with self.lock:
+            key = (method, route, f'{status // 100}xx')
+            stats = self.routes.get(key)
+            if stats is None:
+                stats = self.routes[key] = RouteStats()
+            stats.add(status, elapsed_ms, size)
+            due = time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Log and reset the aggregated counters"""
+        with self.lock:
+            routes, self.routes = self.routes, {}
+            interval = time.monotonic() - self.last_flush
+            self.last_flush = time.monotonic()
+        for (method, route, status), stats in sorted(routes.items()):
+            logger.info(json.dumps({
+                'event': 'route_stats',
+                'method': method,
+                'route': route,
+                'status': status,
+                'interval_s': round(interval, 1),
+                **stats.as_dict(),
+            }))
+
+    def log_sample(self, request, status, elapsed_ms):
+        """Log the full diagnostics of one sampled request"""
+        headers = {
+            name: value for name, value in request.headers.items()
+            if name.lower() not in REDACTED_HEADERS
+        }
+        logger.info(json.dumps({
+            'event': 'request_sample',
+            'method': request.method,
+            'path': request.path,
+            'status': status,
+            'elapsed_ms': round(elapsed_ms, 2),
+            'headers': headers,
+        }))
+
+telemetry = Telemetry(
+    sample_rate=getattr(settings, 'TELEMETRY_SAMPLE_RATE', 0.01),
+    flush_interval=getattr(settings, 'TELEMETRY_FLUSH_INTERVAL', 60),
+)
@@ -0,0 +1,27 @@
+"""
+Helpers shared by the apps' test suites.
+
+Tests run against the database from DATABASE_URL as usual, but never touch
+the Redis at REDIS_URL: FakeRedisTestCase swaps the cache's connections for
+an in-process fakeredis (with Lua, for the rate limit and publish scripts).
+"""
+from copy import deepcopy
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from fakeredis import FakeRedisConnection
+from core.cache_utils import local_cache
+
+def fake_redis_caches():
+    """settings.CACHES with the default cache served by fakeredis"""
+    caches = deepcopy(settings.CACHES)
+    caches['default']['OPTIONS']['CONNECTION_POOL_KWARGS'] = {'connection_class': FakeRedisConnection}
+    return caches
+
+@override_settings(CACHES=fake_redis_caches())
+class FakeRedisTestCase(TestCase):
+    """TestCase starting every test with an empty fakeredis and an empty per-process payload cache"""
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        local_cache.clear()
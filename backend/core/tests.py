@@ -0,0 +1,147 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from unittest import mock, skipIf
+from core.ratelimit import Limit, check_limits
+from core.serializers import ORJSON_MISMATCH, ValuesListSerializer, orjson, render_json
+from core.testing import FakeRedisTestCase
+from courses.models import Course
+from courses.serializers import CourseSerializer
+from professors.models import Department, Professor
+from professors.serializers import DepartmentSerializer, ProfessorSerializer
+
+# Start of a 60 second window, so elapsed fractions come out exact
+WINDOW_START = 60.0 * 1000
+
+class RateLimitTests(FakeRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.limit = Limit('client', 10, 60)
+
+    def check(self, now):
+        return check_limits([self.limit], now=now)[0]
+
+    def counter(self, now):
+        """Requests counted in the window containing now"""
+        return cache.get(f'ratelimit:client:{int(now // 60)}', 0)
+
+    def fill(self, now, requests):
+        for _ in range(requests):
+            self.assertTrue(self.check(now).allowed)
+
+    def test_request_over_the_limit_is_rejected_and_not_counted(self):
+        now = WINDOW_START + 10
+        self.fill(now, 10)
+
+        for _ in range(5):
+            result = self.check(now)
+            self.assertFalse(result.allowed)
+            self.assertEqual(result.count, 10)
+        self.assertEqual(self.counter(now), 10)
+
+    def test_retry_after_a_full_window(self):
+        now = WINDOW_START + 15
+        self.fill(now, 10)
+
+        retry_after = self.check(now).retry_after
+        # The window rolls over in 45s; this window's 10 requests then weigh in
+        # as the previous window until their weight drops to 9 (one tenth in)
+        self.assertAlmostEqual(retry_after, 45 + 6)
+
+        self.assertFalse(self.check(now + retry_after - 0.01).allowed)
+        self.assertEqual(self.counter(now + retry_after), 0)
+        self.assertTrue(self.check(now + retry_after + 0.01).allowed)
+
+    def test_retry_after_while_previous_window_decays(self):
+        self.fill(WINDOW_START + 30, 10)
+        now = WINDOW_START + 60 + 15
+        # Estimate is current + 1 + 10 * 0.75: two more fit, the third doesn't
+        self.fill(now, 2)
+        result = self.check(now)
+        self.assertFalse(result.allowed)
+        self.assertAlmostEqual(result.count, 2 + 10 * 0.75)
+
+        # Room for one more once the previous window's weight drops to 0.7
+        self.assertAlmostEqual(result.retry_after, 3)
+        self.assertFalse(self.check(now + result.retry_after - 0.01).allowed)
+        self.assertTrue(self.check(now + result.retry_after + 0.01).allowed)
+        self.assertEqual(self.counter(now), 3)
+
+    def test_limits_are_checked_together(self):
+        burst = Limit('burst', 2, 1)
+        now = WINDOW_START + 10
+        for _ in range(2):
+            self.assertTrue(all(result.allowed for result in check_limits([self.limit, burst], now=now)))
+
+        steady, burst_result = check_limits([self.limit, burst], now=now)
+        self.assertTrue(steady.allowed)
+        self.assertFalse(burst_result.allowed)
+        # Rejected by one limit, so counted against none
+        self.assertEqual(self.counter(now), 2)
+
+    def test_redis_failure_allows_requests(self):
+        with mock.patch('core.ratelimit.get_redis_connection', side_effect=ConnectionError('down')):
+            result = self.check(WINDOW_START)
+        self.assertTrue(result.allowed)
+
+class ValuesListSerializerTests(TestCase):
+    """ValuesListSerializer and render_json must produce the bytes the ModelSerializer path does"""
+    @classmethod
+    def setUpTestData(cls):
+        Course.objects.create(
+            title='Intro to Computer Science', department='Computer Science', instructor='Ada Lovelace',
+            term='2023 Fall', subject='COMPSCI 50', blue_course_id='1', url='https://example.com/1',
+            responses=120, course_mean_rating=4.25, response_ratio=0.1, course_mean_grade='A',
+        )
+        # Unicode line separators, tiny and huge floats, and nulls throughout
+        Course.objects.create(
+            title='Café\u2028Culture\u2029', department='History', instructor='李白',
+            term='2021 Spring', subject='HIST 10', blue_course_id='2', url='https://example.com/2',
+            course_mean_rating=1e-05, hours_mean_rating=1e16, response_ratio=3.0,
+        )
+        Department.objects.create(name='Computer Science', professor_count=12, empirical_bayes_average=4.1)
+        Department.objects.create(name='History', empirical_bayes_rank=1e-06)
+        Professor.objects.create(
+            name='Ada Lovelace', departments='Computer Science', total_ratings=250.0,
+            empirical_bayes_average=0.30000000000000004, empirical_bayes_rank=1,
+        )
+        Professor.objects.create(intra_department_metrics='Line\u2028separated\u2029')
+        Professor.objects.create()
+
+    CASES = [
+        (Course, CourseSerializer, None),
+        (Course, CourseSerializer, ['id', 'title', 'course_mean_rating', 'hours_mean_rating', 'modified_at']),
+        (Department, DepartmentSerializer, None),
+        (Department, DepartmentSerializer, ['name', 'empirical_bayes_rank']),
+        (Professor, ProfessorSerializer, None),
+        (Professor, ProfessorSerializer, ['name', 'total_ratings', 'empirical_bayes_average', 'intra_department_metrics']),
+    ]
+
+    def assert_same_bytes(self):
+        for model, serializer_class, fields in self.CASES:
+            with self.subTest(serializer=serializer_class.__name__, fields=fields):
+                queryset = model.objects.order_by('id')
+                expected = JSONRenderer().render(serializer_class(queryset, many=True, fields=fields).data)
+                self.assertEqual(ValuesListSerializer(serializer_class, fields).render(queryset), expected)
+
+    @skipIf(orjson is None, 'orjson is not installed')
+    def test_same_bytes_with_orjson(self):
+        self.assert_same_bytes()
+
+    def test_same_bytes_without_orjson(self):
+        with mock.patch('core.serializers.orjson', None):
+            self.assert_same_bytes()
+
+    @skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_mismatches_fall_back_to_json_renderer(self):
+        for value in [1e-05, -2.5e-07, 1e16, 1.5e20, [1e-05], {'a': 1e16}]:
+            with self.subTest(value=value):
+                data = [{'id': 1, 'value': value}]
+                self.assertTrue(ORJSON_MISMATCH.search(orjson.dumps(data)))
+                self.assertEqual(render_json(data), JSONRenderer().render(data))
+
+    @skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_used_when_output_matches(self):
+        data = [{'id': 1, 'value': 0.0001, 'big': 1e15, 'text': 'a\u2028b\u2029 "1e5"'}]
+        self.assertFalse(ORJSON_MISMATCH.search(orjson.dumps(data)))
+        self.assertEqual(render_json(data), JSONRenderer().render(data))
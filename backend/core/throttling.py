@@ -1,6 +1,82 @@
 from rest_framework import throttling
+from rest_framework.request import Request
+from core.ratelimit import Limit, check_limits
 
-class TokenRateThrottle(throttling.AnonRateThrottle):
+def pending_limits(request, view, throttles, extra_limits=()):
+    """Limits of the throttles, plus extra_limits, not yet evaluated for this request"""
+    results = getattr(request, 'rate_limit_results', None) or {}
+    limits = {limit.key: limit for limit in extra_limits}
+    for throttle in throttles:
+        limit = throttle.get_limit(request, view) if isinstance(throttle, RedisRateThrottle) else None
+        if limit is not None and limit.key not in results:
+            limits.setdefault(limit.key, limit)
+    return list(limits.values())
+
+def record_limit_results(request, results):
+    request.rate_limit_results = {
+        **(getattr(request, 'rate_limit_results', None) or {}),
+        **{result.limit.key: result for result in results},
+    }
+    return request.rate_limit_results
+
+def as_drf_request(request, view):
+    """
+    The DRF request throttles see: request itself, or a plain HttpRequest
+    wrapped with the view's authenticators, so a middleware computes the same
+    keys (and reads the same user) as the view will, wherever it is installed
+    """
+    if isinstance(request, Request):
+        return request
+    authenticators = view.get_authenticators() if view is not None else ()
+    return Request(request, authenticators=authenticators)
+
+def evaluate_throttles(request, view, throttles, extra_limits=()):
+    """
+    Check every throttle's limit plus extra_limits in one round-trip and
+    record the results on the underlying HttpRequest, where every DRF Request
+    wrapping it can read them. Limits already evaluated for this request are
+    not counted again, so RateLimitMiddleware can check a view's throttles up
+    front and the throttles themselves just read the outcome.
+    """
+    request = as_drf_request(request, view)
+    limits = pending_limits(request, view, throttles, extra_limits)
+    return record_limit_results(request._request, check_limits(limits))
+
+class RedisRateThrottle(throttling.SimpleRateThrottle):
+    """
+    SimpleRateThrottle backed by an atomic Redis counter instead of a cached
+    list of request timestamps. The first throttle to run evaluates all of
+    the view's throttles at once, so a request costs one round-trip however
+    many scopes apply.
+    """
+    def get_limit(self, request, view):
+        if self.rate is None:
+            return None
+        key = self.get_cache_key(request, view)
+        return Limit(key, self.num_requests, self.duration) if key is not None else None
+
+    def allow_request(self, request, view):
+        limit = self.get_limit(request, view)
+        if limit is None:
+            return True
+
+        self.key = limit.key
+        results = getattr(request, 'rate_limit_results', None) or {}
+        if self.key not in results:
+            results = evaluate_throttles(request, view, [self, *view.get_throttles()])
+        self.result = results[self.key]
+        return self.result.allowed
+
+    def wait(self):
+        return self.result.retry_after
+
+class AnonRateThrottle(RedisRateThrottle, throttling.AnonRateThrottle):
+    pass
+
+class UserRateThrottle(RedisRateThrottle, throttling.UserRateThrottle):
+    pass
+
+class TokenRateThrottle(RedisRateThrottle, throttling.AnonRateThrottle):
     rate = '100/minute'
     scope = 'token_gen'
 
@@ -12,7 +88,7 @@ class TokenRateThrottle(throttling.AnonRateThrottle):
             'ident': ident
         }
 
-class APIEndpointRateThrottle(throttling.UserRateThrottle):
+class APIEndpointRateThrottle(RedisRateThrottle, throttling.UserRateThrottle):
     rate = '500/hour'
     scope = 'api_endpoints'
 
@@ -23,7 +99,7 @@ class APIEndpointRateThrottle(throttling.UserRateThrottle):
         else:
             # For unauthenticated users, use their IP
             ident = self.get_ident(request)
-            
+
         return self.cache_format % {
             'scope': self.scope,
             'ident': ident
@@ -8,6 +8,9 @@ from django.utils import timezone
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET
 from django_redis import get_redis_connection  # Import get_redis_connection
+from django.conf import settings
+from core.async_views import async_list_view
+from core.views import dataset_export
 
 api_router = DefaultRouter()
 api_router.register(r'courses', CourseViewSet, basename='course')
@@ -65,6 +68,13 @@ def health_check(request):
     
     return JsonResponse(status, status=200 if status["status"] == "OK" else 503)
 
+# Under ASGI, plain list GETs go to the async fast path; everything else still reaches the viewsets
+async_list_patterns = [
+    path('api/courses/', async_list_view(CourseViewSet), name='course-list-async'),
+    path('api/professors/', async_list_view(ProfessorViewSet), name='professor-list-async'),
+    path('api/departments/', async_list_view(DepartmentViewSet), name='department-list-async'),
+] if settings.ASYNC_API else []
+
 urlpatterns = [
     # Admin interface
     path('admin/', admin.site.urls),
@@ -73,6 +83,10 @@ urlpatterns = [
     path('healthz/', health_check, name='health_check'),
     path('api/health/', health_check, name='health_check'),
 
+    # Arrow / Parquet exports for bulk consumers
+    path('api/exports/<str:dataset>.<str:export_format>', dataset_export, name='dataset_export'),
+
     # API endpoints
+    *async_list_patterns,
     path('api/', include(api_router.urls)),
 ]
\ No newline at end of file
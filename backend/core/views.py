@@ -5,6 +5,10 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.core.cache import cache
 from django.db import connection
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from core.exports import EXPORT_DATASETS, EXPORT_FORMATS, ExportUnavailable, export_path, get_current_export
+import mmap
 
 def landing_page(request):
     return render(request, 'base.html')  # Ensure 'base.html' exists and is correctly referenced
@@ -24,4 +28,42 @@ def health_check(request):
     except Exception:
         return Response({"status": "error", "detail": "Cache unavailable"}, status=503)
 
-    return Response({"status": "healthy"}, status=200)
\ No newline at end of file
+    return Response({"status": "healthy"}, status=200)
+
+def export_pending_response():
+    """503 while export_datasets hasn't written the files for the current data version"""
+    return Response({"detail": "Export is being generated"}, status=503, headers={"Retry-After": "30"})
+
+@api_view(['GET', 'HEAD'])
+def dataset_export(request, dataset, export_format):
+    """Serve a dataset as an Arrow IPC or Parquet file, as generated by export_datasets for the current data version"""
+    if dataset not in EXPORT_DATASETS or export_format not in EXPORT_FORMATS:
+        return Response({"error": "Unknown export"}, status=404)
+
+    try:
+        fingerprint = get_current_export(dataset)
+    except ExportUnavailable as e:
+        return Response({"error": str(e)}, status=501)
+    if fingerprint is None:
+        return export_pending_response()
+
+    etag = f'"{fingerprint}-{export_format}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+        return response
+
+    # Serve straight from the page cache instead of copying the file into the worker
+    try:
+        with open(export_path(dataset, fingerprint, export_format), 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:  # Pruned by a newer export since the manifest was read
+        return export_pending_response()
+    response = FileResponse(
+        mapped,
+        as_attachment=True,
+        filename=f'{dataset}-{fingerprint}.{export_format}',
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response['ETag'] = etag
+    return response
\ No newline at end of file
@@ -1,8 +1,234 @@
 from rest_framework import viewsets
+from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.http import http_date
 from core.throttling import APIEndpointRateThrottle
+from core.cache_utils import (
+    build_payload, get_cached_chunks, get_cached_metadata, get_cached_payload, get_current_name,
+    get_data_version, get_previous_name, iter_chunked_json, payload_key, publish_payload,
+    set_cached_payload, single_flight,
+)
+from core.db import with_db_retry
+from core.serializers import ValuesListSerializer
+from core.responses import apply_validators, body_response, not_modified_response, payload_response, streaming_response
+import hashlib
 
 class ThrottledViewSet(viewsets.ModelViewSet):
     """
     Base ViewSet that includes rate limiting
     """
     throttle_classes = [APIEndpointRateThrottle]
+
+class CachedListMixin:
+    """
+    Serve the full list from a pre-encoded cached payload with ETag and
+    Last-Modified validators computed once per cache build. Conditional
+    requests are answered with a 304 from the small metadata key alone.
+    If only the warmed chunks survive in cache they are streamed out with a
+    single MGET instead of rebuilding the list from the database.
+
+    Clients can ask for a sparse fieldset with ?fields=a,b,c or a named
+    ?profile= from field_profiles. Only those columns are loaded from the
+    database. Each named profile gets its own cached payload; an arbitrary
+    ?fields= list is rendered for that request only, so clients can't fill
+    the cache with one build per combination.
+
+    Views that add ColumnarJSONRenderer also serve ?format=columnar, with
+    the columns in dictionary_fields dictionary-encoded.
+
+    On a miss only one worker rebuilds each variant. Concurrent requests for
+    the default list get the previous generation while it is rebuilt; the
+    rest wait for the rebuild instead of all hitting the database at once.
+    """
+    cache_name = None
+    field_profiles = {}
+    dictionary_fields = ()
+
+    def get_requested_fields(self, request):
+        """Resolve ?profile= / ?fields= into a tuple of field names, or None for all fields"""
+        params = request.query_params
+        if 'profile' in params:
+            profile = params['profile']
+            if profile not in self.field_profiles:
+                raise ValidationError({'profile': f'Unknown profile. Choose from: {", ".join(self.field_profiles)}'})
+            return tuple(self.field_profiles[profile])
+
+        if 'fields' in params:
+            available = list(self.get_serializer_class()().fields)
+            requested = {name.strip() for name in params['fields'].split(',') if name.strip()}
+            unknown = sorted(requested - set(available))
+            if unknown or not requested:
+                raise ValidationError({'fields': f'Unknown fields: {", ".join(unknown)}' if unknown else 'No fields given.'})
+            # Declared order keeps equivalent requests on the same cache entry
+            return tuple(name for name in available if name in requested)
+
+        return None
+
+    def get_fields_queryset(self, queryset, fields):
+        """Defer every column the fieldset doesn't need"""
+        return queryset.only(*fields) if fields else queryset
+
+    def get_layout(self):
+        """'columnar' when the client negotiated the columnar renderer, else 'rows'"""
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        return 'columnar' if getattr(renderer, 'format', None) == 'columnar' else 'rows'
+
+    def render_list(self, queryset, fields=None):
+        """Render the list with the values_list() fast path; selects only the fieldset's columns"""
+        serializer = ValuesListSerializer(self.get_serializer_class(), fields)
+        if self.get_layout() == 'columnar':
+            return serializer.render_columnar(queryset, self.dictionary_fields)
+        return serializer.render(queryset)
+
+    def is_cached_fieldset(self, fields):
+        """Only the full list and the named profiles are cached"""
+        return fields is None or fields in (tuple(profile) for profile in self.field_profiles.values())
+
+    @with_db_retry
+    def rendered_list_response(self, request, queryset, fields=None):
+        """Render a list variant for this request only, without caching it"""
+        return body_response(request, self.render_list(queryset, fields))
+
+    def is_default_variant(self, fields):
+        return not fields and self.get_layout() == 'rows'
+
+    def get_variant_name(self, fields, version=None):
+        """
+        Cache name for a fieldset and layout. The default list lives in the
+        current published generation (None if there is none); other
+        variants are namespaced by data version, the current one unless a
+        version is given.
+        """
+        if self.is_default_variant(fields):
+            return get_current_name(self.cache_name)
+        if version is None:
+            version = get_data_version(self.cache_name)
+        layout = self.get_layout()
+        digest = hashlib.md5(','.join(fields or ()).encode()).hexdigest()[:16]
+        return f'{self.cache_name}_v{version}_{layout}_{digest}'
+
+    def get_build_id(self, fields):
+        """Lock id shared by every request rebuilding the same variant"""
+        digest = hashlib.md5(','.join(fields or ()).encode()).hexdigest()[:16]
+        return f'build_{self.cache_name}_{self.get_layout()}_{digest}'
+
+    def read_cached_payload(self, name):
+        """(payload, metadata) cached under name, or None unless both are present"""
+        if name is None:
+            return None
+        metadata = get_cached_metadata(name)
+        payload = get_cached_payload(payload_key(name), metadata['etag']) if metadata is not None else None
+        return (payload, metadata) if payload is not None else None
+
+    @with_db_retry
+    def build_cached_payload(self, fields=None):
+        """Serialize, render and compress the full list once"""
+        queryset = self.get_queryset()
+        stats = queryset.aggregate(last_modified=Max('modified_at'), count=Count('id'))
+        return build_payload(self.render_list(queryset, fields), stats['last_modified'], count=stats['count'])
+
+    def get_or_build_payload(self, fields=None):
+        """(payload, metadata) of a variant, rebuilt by a single worker on a miss"""
+        # Read before the build touches the database, so a rebuild that
+        # overlaps an import is stored under (or checked against) the old version
+        version = get_data_version(self.cache_name)
+        return single_flight(
+            self.get_build_id(fields),
+            build=lambda: (
+                self.read_cached_payload(self.get_variant_name(fields, version))
+                or self.store_cached_payload(fields, version)
+            ),
+            read=lambda: self.read_cached_payload(self.get_variant_name(fields)),
+            stale=(
+                (lambda: self.read_cached_payload(get_previous_name(self.cache_name)))
+                if self.is_default_variant(fields) else None
+            ),
+        )
+
+    def get_list_metadata(self):
+        """
+        Metadata of the full default list (count, validators, size) as
+        written at cache-build time, building the list only if it is missing.
+        """
+        name = get_current_name(self.cache_name)
+        metadata = get_cached_metadata(name) if name else None
+        if metadata is None or 'count' not in metadata:
+            _, metadata = self.get_or_build_payload()
+        return metadata
+
+    def describe_list(self, metadata):
+        return {
+            'count': metadata['count'],
+            'version': get_data_version(self.cache_name),
+            'generation': metadata.get('generation'),
+            'etag': metadata['etag'],
+            'size': metadata['size'],
+            'last_modified': http_date(metadata['last_modified']) if metadata.get('last_modified') else None,
+        }
+
+    def list_metadata_response(self, request, body=True):
+        """
+        Describe the full list without touching the database: the JSON
+        description as the body, or just headers for HEAD requests.
+        """
+        metadata = self.get_list_metadata()
+        response = not_modified_response(request, metadata)
+        if response is not None:
+            return response
+
+        description = self.describe_list(metadata)
+        headers = {
+            'X-Total-Count': description['count'],
+            'X-Data-Version': description['version'],
+            'X-Payload-Size': description['size'],
+        }
+        return apply_validators(Response(description if body else None, headers=headers), metadata)
+
+    def cached_list_response(self, request, fields=None):
+        if not self.is_cached_fieldset(fields):
+            return self.rendered_list_response(request, self.get_queryset(), fields)
+
+        name = self.get_variant_name(fields)
+        metadata = get_cached_metadata(name) if name else None
+        if metadata is not None:
+            response = not_modified_response(request, metadata)
+            if response is not None:
+                return response
+
+        payload = get_cached_payload(payload_key(name), metadata['etag']) if metadata is not None else None
+        if payload is None and metadata is not None and metadata.get('total_chunks'):
+            chunks = get_cached_chunks(name, metadata)
+            if chunks is not None:
+                return apply_validators(streaming_response(request, iter_chunked_json(chunks)), metadata)
+
+        if payload is None or metadata is None:
+            payload, metadata = self.get_or_build_payload(fields)
+            response = not_modified_response(request, metadata)
+            if response is not None:
+                return response
+
+        return apply_validators(payload_response(request, payload), metadata)
+
+    @with_db_retry
+    def uncached_list_response(self, request, fields=None):
+        """Plain DRF response straight from the database, for when the cache is unusable"""
+        queryset = self.get_fields_queryset(self.get_queryset(), fields)
+        if self.get_layout() == 'columnar':
+            serializer = ValuesListSerializer(self.get_serializer_class(), fields)
+            return Response(serializer.serialize_columnar(queryset, self.dictionary_fields))
+        serializer = self.get_serializer(queryset, many=True, fields=fields)
+        return Response(serializer.data)
+
+    def store_cached_payload(self, fields, version):
+        """
+        Build a variant from data read under version and store it: the
+        default list as a new generation, published only if the version is
+        still current, any other variant under that version's name
+        """
+        payload, metadata = self.build_cached_payload(fields)
+        if self.is_default_variant(fields):
+            publish_payload(self.cache_name, payload, metadata, version)
+        else:
+            set_cached_payload(self.get_variant_name(fields, version), payload, metadata)
+        return payload, metadata
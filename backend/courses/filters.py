@@ -0,0 +1,102 @@
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from .models import Course
+import hashlib
+import json
+
+# Exact-match filters, covered by the (term, department, instructor) index
+MATCH_FILTERS = ('term', 'department', 'instructor')
+
+# Rating fields that accept min_<field> / max_<field> range filters
+SCORE_FIELDS = tuple(
+    field.name for field in Course._meta.get_fields()
+    if field.name.endswith('_bayesian_score') or field.name.endswith('_bayesian_score_department')
+)
+
+ORDERING_FIELDS = ('title', 'department', 'instructor', 'term', 'responses', 'course_mean_rating') + SCORE_FIELDS
+
+class CourseQuery:
+    """
+    Server-side filtering, search and sorting for /api/courses/.
+
+    Supported parameters (repeat a match filter to OR its values):
+        ?term=2023 Fall&department=Computer Science&instructor=...
+        ?min_course_mean_rating_bayesian_score=4&max_...=5
+        ?search=linear algebra
+        ?ordering=-course_mean_rating_bayesian_score,title
+
+    Parameters are normalized (sorted, deduplicated) so equivalent queries
+    share one cache entry.
+    """
+    PARAMS = MATCH_FILTERS + ('search', 'ordering')
+
+    def __init__(self, filters, ranges, search, ordering):
+        self.filters = filters
+        self.ranges = ranges
+        self.search = search
+        self.ordering = ordering
+
+    @classmethod
+    def is_requested(cls, request):
+        return any(
+            name in cls.PARAMS or (name[:4] in ('min_', 'max_') and name[4:] in SCORE_FIELDS)
+            for name in request.query_params
+        )
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        errors = {}
+
+        filters = {}
+        for name in MATCH_FILTERS:
+            values = sorted({value for value in params.getlist(name) if value})
+            if values:
+                filters[name] = values
+
+        ranges = {}
+        for name in params:
+            bound, _, field = name.partition('_')
+            if bound not in ('min', 'max') or field not in SCORE_FIELDS:
+                continue
+            try:
+                ranges[f'{field}__{"gte" if bound == "min" else "lte"}'] = float(params[name])
+            except ValueError:
+                errors[name] = 'Must be a number.'
+
+        search = params.get('search', '').strip()
+
+        ordering = []
+        for term in params.get('ordering', '').split(','):
+            term = term.strip()
+            if not term:
+                continue
+            if term.lstrip('-') not in ORDERING_FIELDS:
+                errors['ordering'] = f'Unknown ordering field: {term.lstrip("-")}'
+                continue
+            ordering.append(term)
+
+        if errors:
+            raise ValidationError(errors)
+        return cls(filters, dict(sorted(ranges.items())), search, ordering)
+
+    def apply(self, queryset):
+        for name, values in self.filters.items():
+            queryset = queryset.filter(**{f'{name}__in': values})
+        if self.ranges:
+            queryset = queryset.filter(**self.ranges)
+        if self.search:
+            queryset = queryset.filter(
+                Q(title__icontains=self.search)
+                | Q(instructor__icontains=self.search)
+                | Q(department__icontains=self.search)
+            )
+        # id breaks ties so the order, and with it the cached body, is stable
+        return queryset.order_by(*(self.ordering or ['title']), 'id')
+
+    def cache_key(self, version, fields=None, layout='rows'):
+        normalized = json.dumps(
+            [self.filters, self.ranges, self.search, self.ordering, fields, layout],
+            sort_keys=True,
+        )
+        return f'courses_query:{version}:{hashlib.md5(normalized.encode()).hexdigest()}'
@@ -0,0 +1,448 @@
+"""
+Q Guide import pipeline used by the import_courses command.
+
+Parsing is done by plain functions that turn one course record from the
+dump into plain rows (no models, no database), so it can be batched and
+tested in isolation. CourseWriter then inserts those rows in batches with
+bulk_create, or COPY for the child tables on Postgres.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.db import connection, connections, transaction
+from courses.models import Course, CourseFeedbackQuestion, InstructorFeedbackQuestion, HoursAndRecQuestion, CourseComment
+from courses.questions import LECTURE_FORMAT_NOTE, RATING_QUESTIONS, classify_questions
+import csv
+import django
+import hashlib
+import io
+import json
+import logging
+import re
+
+try:
+    import ijson
+except ImportError:  # ijson is optional, the stdlib fallback streams the same records more slowly
+    ijson = None
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the dump at a time by the stdlib streaming parser
+READ_SIZE = 1 << 20
+
+# Largest course record the stdlib parser buffers while looking for its end.
+# Records are a few KB, so anything bigger is a malformed dump, reported
+# without reading the rest of it into memory
+MAX_ITEM_SIZE = 16 << 20
+
+MISSING_VALUES = ("NRP", "NA", "", "N/A")
+
+HOURS_KEY = "on_average,_how_many_hours_per_week_did_you_spend_on_coursework_outside_of_class?_enter_a_whole_number_between_0_and_168."
+RECOMMEND_KEY = "how_strongly_would_you_recommend_this_course_to_your_peers?"
+
+# Column order of the child rows produced by parse_course
+COURSE_QUESTION_FIELDS = ('question', 'count', 'excellent_count', 'very_good_count', 'good_count', 'fair_count', 'unsatisfactory_count', 'course_mean', 'fas_mean')
+INSTRUCTOR_QUESTION_FIELDS = ('question', 'count', 'excellent_count', 'very_good_count', 'good_count', 'fair_count', 'unsatisfactory_count', 'instructor_mean', 'fas_mean')
+HOURS_FIELDS = ('response_count', 'response_ratio', 'mean', 'median', 'mode', 'standard_dev')
+COMMENT_FIELDS = ('comment_text',)
+
+RATING_COLUMNS = ('Excellent', 'Very Good', 'Good', 'Fair', 'Unsatisfactory')
+
+def clean_float_value(string_input):
+    if string_input == "0%":
+        return float(0)
+    if not string_input or string_input in MISSING_VALUES:
+        return None
+    if "%" in string_input:
+        return float(string_input[:-1]) / 100
+    try:
+        return float(string_input)
+    except ValueError:
+        logger.warning(f"Unable to convert to float: {string_input}")
+        return None
+
+def clean_numeric_value(string_input):
+    """Whole-number counterpart of clean_float_value ("12", "12.0", 12 -> 12)"""
+    if isinstance(string_input, int):
+        return string_input
+    value = clean_float_value(string_input)
+    return int(value) if value is not None else None
+
+ARRAY_SEPARATOR = re.compile(r'[\s,]*')
+
+def iter_json_array(f, read_size=READ_SIZE, max_item_size=MAX_ITEM_SIZE):
+    """
+    Yield the items of a top-level JSON array from a text file one at a time,
+    holding only the current read buffer in memory (stdlib stand-in for ijson).
+    Raises ValueError once an item still doesn't parse after max_item_size
+    characters.
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(read_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("Expected a JSON array of courses")
+    position = 1
+    while True:
+        position = ARRAY_SEPARATOR.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            # The next item runs past the end of the buffer, or is malformed
+            if len(buffer) - position > max_item_size:
+                raise ValueError(f"Malformed course record, or one over {max_item_size} characters: {e}") from e
+            data = f.read(read_size)
+            if not data:
+                raise
+            buffer = buffer[position:] + data
+            position = 0
+            continue
+        yield item
+
+def iter_course_records(path):
+    """
+    Yield the course records of a dump one at a time, so memory stays flat
+    however large it grows. Accepts the scraper's JSON array (streamed with
+    ijson when installed) or JSON lines, one course per line.
+    """
+    with open(path, 'rb') as f:
+        if f.peek(64).lstrip().startswith(b'['):
+            if ijson is not None:
+                yield from ijson.items(f, 'item', use_float=True)
+            else:
+                yield from iter_json_array(io.TextIOWrapper(f, encoding='utf-8'))
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+# THERE"S SOMETHING BAD WITH THE ROUNDING HERE!!!!! ## REMMEBER ####
+def get_counts_from_percentages(percentages, total_count):
+    total_count = int(total_count)
+    counts = []
+
+    # First pass: calculate counts based on rounded percentages
+    for percent in percentages:
+        if percent in ["NRP", "NA", "", "N/A", "0%", "N/"]:
+            counts.append(0)
+            continue
+        count = round((clean_float_value(percent[:-1]) / 100) * total_count)
+        counts.append(count)
+
+    return counts
+
+def safe_get(lst, index, default=None): # the data is SO NASTYYYYY
+    try:
+        return lst[index]
+    except IndexError:
+        return default if default is not None else {}
+
+def parse_question_rows(questions, mean_column):
+    """Rows for the per-question feedback tables, in COURSE/INSTRUCTOR_QUESTION_FIELDS order"""
+    rows = []
+    for question_data in questions:
+        rating_counts = get_counts_from_percentages([question_data.get(column) for column in RATING_COLUMNS], question_data.get('Count'))
+        question = question_data.get('')
+        if LECTURE_FORMAT_NOTE in question: # will likely have to change later
+            question = "Facilitates discussion and encourages participation"
+        rows.append((
+            question,
+            question_data.get('Count'),
+            *rating_counts,
+            clean_float_value(question_data.get(mean_column)),
+            clean_float_value(question_data.get('FAS Mean')),
+        ))
+    return rows
+
+def parse_course(course_data):
+    """
+    Turn one course record from the dump into plain data:
+    {'course': {field: value}, 'course_questions': [row], 'instructor_questions': [row],
+     'hours': row or None, 'comments': [row]}
+    Raises on records too malformed to import.
+    """
+    feedback_data = course_data.get('Feedback', {})
+    course = {
+        'title': course_data.get('Title'),
+        'department': course_data.get('Department'),
+        'term': course_data.get('Term'),
+        'subject': course_data.get('Subject'),
+        'blue_course_id': course_data.get('Bluecourseid'),
+        'url': course_data.get('Url'),
+    }
+
+    # is default value of zero bad?? we'll worry about that later
+    if len(feedback_data) > 0:
+        response_rate = feedback_data.get("course_response_rate", [{}])
+        course['responses'] = int(response_rate[0].get("Students", 0))
+        course['invited_responses'] = int(response_rate[1].get("Students", 0))
+        course['response_ratio'] = clean_float_value(safe_get(response_rate, 2, {}).get("Students", 0.0))
+
+        items = classify_questions(feedback_data)
+        for field, (_, _, mean_column) in RATING_QUESTIONS.items():
+            item = items.get(field)
+            course[field] = clean_float_value(item.get(mean_column)) if item else None
+
+        course['hours_mean_rating'] = clean_float_value(safe_get(feedback_data.get(HOURS_KEY, [{}]), 2, {}).get("Value", 0))
+        course['recommend_mean_rating'] = clean_float_value(safe_get(feedback_data.get(RECOMMEND_KEY, [{}]), 1, {}).get("Value", None))
+        course['number_comments'] = len(feedback_data.get("comments_from_students", []))
+        course['instructor'] = feedback_data.get('Instructor Name', [{}])[0].get('Instructor Name', course_data.get('Instructor'))
+    else:
+        course.update(
+            responses=0,
+            invited_responses=0,
+            response_ratio=0.0,
+            hours_mean_rating=0,
+            recommend_mean_rating=None,
+            number_comments=0,
+            instructor=course_data.get('Instructor'),
+        )
+        course.update(dict.fromkeys(RATING_QUESTIONS))
+
+    # The per-question tables are lowkey depricated, but we'll keep them for now
+    hours_rows = [
+        (
+            clean_numeric_value(question_data.get('Response Count')) or 0,
+            clean_float_value(question_data.get('Response Ratio')),
+            clean_float_value(question_data.get('Mean')),
+            clean_float_value(question_data.get('Median')),
+            clean_float_value(question_data.get('Mode')),
+            clean_float_value(question_data.get('Standard Deviation')),
+        )
+        for question_data in feedback_data.get('hours_and_rec_questions', [])
+    ]
+
+    parsed = {
+        'course': course,
+        'course_questions': parse_question_rows(feedback_data.get('course_general_questions', []), 'Course Mean'),
+        'instructor_questions': parse_question_rows(feedback_data.get('general_instructor_questions', []), 'Instructor Mean'),
+        # A course has at most one hours breakdown (one-to-one)
+        'hours': hours_rows[0] if hours_rows else None,
+        'comments': [(comment['Comments'],) for comment in feedback_data.get('comments_from_students', []) if comment.get('Comments')],
+    }
+    course['content_hash'] = content_hash(parsed)
+    return parsed
+
+def content_hash(parsed):
+    """
+    Hash of everything a course import writes. Hashing the parsed rows rather
+    than the raw record means parser fixes also count as changes.
+    """
+    return hashlib.sha256(json.dumps(parsed, sort_keys=True).encode()).hexdigest()
+
+class ImportStats:
+    """Per-question counts, sums and sums of squares (globally and by department) for the Bayesian scores"""
+    def __init__(self):
+        self.counts = {}
+        self.sums = {}
+        self.sum_of_squares = {}
+        self.counts_by_department = {}
+        self.sums_by_department = {}
+        self.sum_of_squares_by_department = {}
+
+    def add(self, department, question, value):
+        self.counts[question] = self.counts.get(question, 0) + 1
+        dept_counts = self.counts_by_department.setdefault(department, {})
+        dept_counts[question] = dept_counts.get(question, 0) + 1
+        if value is None:
+            return
+        self.sums[question] = self.sums.get(question, 0.0) + value
+        self.sum_of_squares[question] = self.sum_of_squares.get(question, 0.0) + value ** 2
+        dept_sums = self.sums_by_department.setdefault(department, {})
+        dept_sums[question] = dept_sums.get(question, 0.0) + value
+        dept_squares = self.sum_of_squares_by_department.setdefault(department, {})
+        dept_squares[question] = dept_squares.get(question, 0.0) + value ** 2
+
+    def add_course(self, parsed):
+        department = parsed['course']['department']
+        for row in parsed['course_questions']:
+            self.add(department, row[0], row[7])
+        for row in parsed['instructor_questions']:
+            self.add(department, row[0], row[7])
+
+    def summary(self):
+        """The sections of import_summary.json read by add_bayesians"""
+        return {
+            "Counts": self.counts,
+            "Sums": self.sums,
+            "SumOfSquares": self.sum_of_squares,
+            "Counts by Department": self.counts_by_department,
+            "SumOfSquares by Department": self.sum_of_squares_by_department,
+            "Sums by Department": self.sums_by_department,
+        }
+
+    def merge(self, other):
+        """Add the totals of another ImportStats, e.g. one from a worker process"""
+        for question, count in other.counts.items():
+            self.counts[question] = self.counts.get(question, 0) + count
+        for question, value in other.sums.items():
+            self.sums[question] = self.sums.get(question, 0.0) + value
+        for question, value in other.sum_of_squares.items():
+            self.sum_of_squares[question] = self.sum_of_squares.get(question, 0.0) + value
+        for mine, theirs in (
+            (self.counts_by_department, other.counts_by_department),
+            (self.sums_by_department, other.sums_by_department),
+            (self.sum_of_squares_by_department, other.sum_of_squares_by_department),
+        ):
+            for department, questions in theirs.items():
+                totals = mine.setdefault(department, {})
+                for question, value in questions.items():
+                    totals[question] = totals.get(question, 0) + value
+
+def parse_chunk(records):
+    """
+    Parse a chunk of course records: (parsed courses, error messages, ImportStats
+    of the parsed courses). Everything returned is plain data, so chunks can be
+    parsed in worker processes.
+    """
+    parsed_courses = []
+    errors = []
+    stats = ImportStats()
+    for course_data in records:
+        try:
+            parsed = parse_course(course_data)
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        parsed_courses.append(parsed)
+        stats.add_course(parsed)
+    return parsed_courses, errors, stats
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def parse_records(records, chunk_size, workers=1):
+    """
+    Yield parse_chunk results for records, chunk_size at a time, in order.
+    With workers > 1 the chunks are parsed by a process pool, with at most two
+    chunks per worker in flight so a streamed dump is never read ahead whole.
+    """
+    if workers <= 1:
+        yield from map(parse_chunk, chunked(records, chunk_size))
+        return
+
+    # Forked workers must not share the parent's database sockets
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+        pending = deque()
+        for chunk in chunked(records, chunk_size):
+            pending.append(executor.submit(parse_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def copy_rows(model, fields, rows):
+    """Insert rows into model's table with Postgres COPY, much faster than INSERT for large child tables"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # \N marks NULL, so empty strings still load as empty strings
+        writer.writerow(['\\N' if value is None else value for value in row])
+    buffer.seek(0)
+    columns = ', '.join(connection.ops.quote_name(model._meta.get_field(field).column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(
+            f"COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+
+class CourseWriter:
+    """
+    Insert parsed courses in batches: one bulk_create for the courses, then
+    one insert per child table for the whole batch. With use_copy the child
+    tables are loaded with COPY on Postgres.
+
+    With update_urls (the urls already in the database) courses are upserted
+    on url instead: changed courses keep their id, their child rows are
+    replaced, and they are counted as updated rather than created.
+    """
+    CHILD_TABLES = (
+        ('course_questions', CourseFeedbackQuestion, COURSE_QUESTION_FIELDS),
+        ('instructor_questions', InstructorFeedbackQuestion, INSTRUCTOR_QUESTION_FIELDS),
+        ('comments', CourseComment, COMMENT_FIELDS),
+    )
+
+    def __init__(self, batch_size=500, use_copy=False, update_urls=None, on_error=None):
+        self.batch_size = batch_size
+        self.use_copy = use_copy and connection.vendor == 'postgresql'
+        self.update_urls = update_urls
+        self.on_error = on_error
+        self.pending = []
+        self.courses_created = 0
+        self.courses_updated = 0
+        self.feedback_created = 0
+        self.comments_created = 0
+        self.course_ids = []
+
+    def add(self, parsed):
+        self.pending.append(parsed)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            with transaction.atomic():
+                courses = self.write(batch)
+            self.record(batch, courses)
+        except Exception as e:
+            # Fall back to one course at a time so a single bad record doesn't sink the batch
+            logger.warning(f"Batch insert failed ({e}), retrying {len(batch)} courses one by one")
+            for parsed in batch:
+                try:
+                    with transaction.atomic():
+                        courses = self.write([parsed])
+                    self.record([parsed], courses)
+                except Exception as e:
+                    if self.on_error is not None:
+                        self.on_error(parsed, e)
+
+    def write(self, batch):
+        courses = [Course(**parsed['course']) for parsed in batch]
+        if self.update_urls is None:
+            courses = Course.objects.bulk_create(courses, batch_size=self.batch_size)
+        else:
+            courses = Course.objects.bulk_create(
+                courses,
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=['url'],
+                update_fields=[field for field in batch[0]['course'] if field != 'url'] + ['modified_at'],
+            )
+            ids = [course.id for course in courses]
+            for _, model, _ in self.CHILD_TABLES:
+                model.objects.filter(course_id__in=ids).delete()
+            HoursAndRecQuestion.objects.filter(course_id__in=ids).delete()
+
+        for key, model, fields in self.CHILD_TABLES:
+            rows = [(course.id, *row) for course, parsed in zip(courses, batch) for row in parsed[key]]
+            self.insert(model, fields, rows)
+        hours = [(course.id, *parsed['hours']) for course, parsed in zip(courses, batch) if parsed['hours']]
+        self.insert(HoursAndRecQuestion, HOURS_FIELDS, hours)
+        return courses
+
+    def record(self, batch, courses):
+        """Count a committed batch"""
+        updated = sum(parsed['course']['url'] in self.update_urls for parsed in batch) if self.update_urls else 0
+        self.courses_created += len(courses) - updated
+        self.courses_updated += updated
+        self.feedback_created += sum(len(parsed['course_questions']) + len(parsed['instructor_questions']) for parsed in batch)
+        self.comments_created += sum(len(parsed['comments']) for parsed in batch)
+        self.course_ids.extend(course.id for course in courses)
+
+    def insert(self, model, fields, rows):
+        if not rows:
+            return
+        if self.use_copy:
+            copy_rows(model, ('course', *fields), rows)
+        else:
+            model.objects.bulk_create(
+                [model(course_id=row[0], **dict(zip(fields, row[1:]))) for row in rows],
+                batch_size=self.batch_size,
+            )
@@ -4,25 +4,14 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.db.models import QuerySet
 from courses.models import Course
+from courses.questions import QUESTION_TEXT
+from core.cache_utils import invalidate_dataset
 
 class Command(BaseCommand):
     help = "Add Empirical Bayes (normal prior) scores + percentile-based letter grades to existing Course objects"
 
     # Map your model fields to the corresponding question keys in the JSON:
-    QUESTION_MAP = {
-        "course_mean_rating":        "Evaluate the course overall.",
-        "materials_mean_rating":     "Course materials (readings, audio-visual materials, textbooks, lab manuals, website, etc.)",
-        "assignments_mean_rating":   "Assignments (exams, essays, problem sets, language homework, etc.)",
-        "feedback_mean_rating":      "Feedback you received on work you produced in this course",
-        "section_mean_rating":       "Section component of the course",
-        "instructor_mean_rating":    "Evaluate your Instructor overall.",
-        "effective_mean_rating":     "Gives effective lectures or presentations, if applicable",
-        "accessible_mean_rating":    "Is accessible outside of class (including after class, office hours, e-mail, etc.)",
-        "enthusiasm_mean_rating":    "Generates enthusiasm for the subject matter",
-        "discussion_mean_rating":    "Facilitates discussion and encourages participation",
-        "inst_feedback_mean_rating": "Gives useful feedback on assignments",
-        "returns_mean_rating":       "Returns assignments in a timely fashion",
-    }
+    QUESTION_MAP = QUESTION_TEXT
 
     grade_boundaries = [ # NOTE THAT THIS IS PERCENTILES, NOT RAW, SO GRADING IS UNCONVENTIONAL
         (0, 0.1, 'S+'),
@@ -264,6 +253,9 @@ class Command(BaseCommand):
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Error during update: {e}"))
 
+        if courses_updated:
+            invalidate_dataset('courses')
+
         # Done
         self.stdout.write(
             self.style.SUCCESS(
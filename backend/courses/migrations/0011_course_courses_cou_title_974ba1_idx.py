@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_course_courses_cou_title_6e78a2_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['title', 'id'], name='courses_cou_title_974ba1_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.3 on 2026-10-18 08:21
+
+from django.db import migrations
+from django.db.models import Min
+
+
+def dedupe_course_urls(apps, schema_editor):
+    """Keep the first imported course for each url, so url can be made unique"""
+    Course = apps.get_model('courses', 'Course')
+    keep = Course.objects.values('url').annotate(first_id=Min('id')).values_list('first_id', flat=True)
+    Course.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_course_courses_cou_title_974ba1_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_course_urls, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 08:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_dedupe_course_urls'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='url',
+            field=models.URLField(max_length=1000, unique=True),
+        ),
+    ]
@@ -19,7 +19,7 @@ class Course(models.Model):
     term = models.CharField(max_length=100, choices=TERM_CHOICES, db_index=True)
     subject = models.CharField(max_length=1000)
     blue_course_id = models.CharField(max_length=100)
-    url = models.URLField(max_length=1000)
+    url = models.URLField(max_length=1000, unique=True)
     responses = models.IntegerField(default=0, db_index=True)
     invited_responses = models.IntegerField(default=0)
     response_ratio = models.FloatField(null=True, blank=True)
@@ -92,12 +92,14 @@ class Course(models.Model):
     returns_mean_grade_department = models.CharField(max_length=2, null=True, blank=True)
 
     modified_at = models.DateTimeField(auto_now=True)
+    content_hash = models.CharField(max_length=64, blank=True, default='')  # Hash of the imported data, for incremental imports
 
     class Meta:
         indexes = [
             models.Index(fields=['term', 'department', 'instructor']),
             models.Index(fields=['course_mean_rating', 'department']),
             models.Index(fields=['title']),  # Add indexes for optimization
+            models.Index(fields=['title', 'id']),  # Keyset pagination order
             models.Index(fields=['department']),
             models.Index(fields=['instructor']),
         ]
@@ -0,0 +1,65 @@
+"""
+The Q Guide rating questions behind the Course rating fields, in one place.
+
+import_courses reads each field's mean from the matching feedback question
+and add_bayesians looks up that question's totals in import_summary.json, so
+both go through this registry and can't drift apart. The question texts are
+compiled once into per-section lookups, and classify_questions sorts a
+course's questions into fields in a single pass.
+"""
+import re
+
+# Course rating field -> (question list in the feedback, question text, mean column)
+RATING_QUESTIONS = {
+    "course_mean_rating": ("course_general_questions", "Evaluate the course overall.", "Course Mean"),
+    "materials_mean_rating": ("course_general_questions", "Course materials (readings, audio-visual materials, textbooks, lab manuals, website, etc.)", "Course Mean"),
+    "assignments_mean_rating": ("course_general_questions", "Assignments (exams, essays, problem sets, language homework, etc.)", "Course Mean"),
+    "feedback_mean_rating": ("course_general_questions", "Feedback you received on work you produced in this course", "Course Mean"),
+    "section_mean_rating": ("course_general_questions", "Section component of the course", "Course Mean"),
+    "instructor_mean_rating": ("general_instructor_questions", "Evaluate your Instructor overall.", "Instructor Mean"),
+    "effective_mean_rating": ("general_instructor_questions", "Gives effective lectures or presentations, if applicable", "Instructor Mean"),
+    "accessible_mean_rating": ("general_instructor_questions", "Is accessible outside of class (including after class, office hours, e-mail, etc.)", "Instructor Mean"),
+    "enthusiasm_mean_rating": ("general_instructor_questions", "Generates enthusiasm for the subject matter", "Instructor Mean"),
+    "discussion_mean_rating": ("general_instructor_questions", "Facilitates discussion and encourages participation", "Instructor Mean"),
+    "inst_feedback_mean_rating": ("general_instructor_questions", "Gives useful feedback on assignments", "Instructor Mean"),
+    "returns_mean_rating": ("general_instructor_questions", "Returns assignments in a timely fashion", "Instructor Mean"),
+}
+
+# Rating field -> question text, the keys of the totals in import_summary.json
+QUESTION_TEXT = {field: question for field, (_, question, _) in RATING_QUESTIONS.items()}
+
+# The dump sometimes reports this disclaimer in place of the discussion question
+LECTURE_FORMAT_NOTE = "If this course was conducted in a lecture format with the involvement of section leaders, one or more of the following questions may not be applicable."
+
+def compile_sections(questions):
+    """section -> ({question text: field}, pattern matching any of the section's question texts)"""
+    sections = {}
+    for field, (section, question, _) in questions.items():
+        sections.setdefault(section, {})[question] = field
+    return {
+        # Longest first, so a question text that contains another one wins
+        section: (fields, re.compile('|'.join(re.escape(question) for question in sorted(fields, key=len, reverse=True))))
+        for section, fields in sections.items()
+    }
+
+SECTIONS = compile_sections(RATING_QUESTIONS)
+
+def classify_questions(feedback_data):
+    """
+    {rating field: question item} for one course's feedback. Like a substring
+    search per field, the first item whose text contains the field's question
+    wins, but every item is looked at once: an exact match is a dict lookup,
+    anything else one search of the compiled pattern.
+    """
+    found = {}
+    for section, (fields, pattern) in SECTIONS.items():
+        for item in feedback_data.get(section, []):
+            text = item.get("", "")
+            field = fields.get(text)
+            if field is None:
+                match = pattern.search(text)
+                if match is None:
+                    continue
+                field = fields[match.group()]
+            found.setdefault(field, item)
+    return found
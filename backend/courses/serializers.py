@@ -1,9 +1,9 @@
 # courses/serializers.py
-from rest_framework import serializers
+from core.serializers import DynamicFieldsModelSerializer
 from .models import Course
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(DynamicFieldsModelSerializer):
     """Serializer for course model"""
     class Meta:
         model = Course
-        fields = '__all__'
\ No newline at end of file
+        exclude = ('content_hash',)
\ No newline at end of file
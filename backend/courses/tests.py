@@ -1,3 +1,302 @@
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TransactionTestCase
+from django_redis.exceptions import ConnectionInterrupted
+from rest_framework.test import APIRequestFactory
+from unittest import mock
+from core.cache_utils import get_data_version
+from core.testing import FakeRedisTestCase
+from courses import importer
+from courses.importer import clean_numeric_value, iter_course_records, iter_json_array
+from courses.models import Course, CourseComment, CourseFeedbackQuestion, HoursAndRecQuestion, InstructorFeedbackQuestion
+from courses.views import CourseViewSet
+import io
+import json
+import os
+import tempfile
 
-# Create your tests here.
+def question(text, mean_column, mean='4.5'):
+    return {
+        "": text, "Count": "10", "Excellent": "50%", "Very Good": "30%", "Good": "10%",
+        "Fair": "10%", "Unsatisfactory": "0%", mean_column: mean, "FAS Mean": "4.1",
+    }
+
+def course_record(index, **overrides):
+    """One course as the scraper dumps it: two course questions, one instructor question, hours and two comments"""
+    record = {
+        "Title": f"Course {index}",
+        "Department": "Computer Science",
+        "Instructor": f"Prof {index}",
+        "Term": "2023 Fall",
+        "Subject": "COMPSCI",
+        "Bluecourseid": str(index),
+        "Url": f"https://qreports.example/{index}",
+        "Feedback": {
+            "course_response_rate": [{"Students": "10"}, {"Students": "20"}, {"Students": "50%"}],
+            "course_general_questions": [
+                question("Evaluate the course overall.", "Course Mean"),
+                question("Course materials (readings, audio-visual materials, textbooks, lab manuals, website, etc.)", "Course Mean"),
+            ],
+            "general_instructor_questions": [question("Evaluate your Instructor overall.", "Instructor Mean")],
+            "hours_and_rec_questions": [
+                {"Response Count": "9", "Response Ratio": "45%", "Mean": "6.5", "Median": "6", "Mode": "5", "Standard Deviation": "2.1"},
+            ],
+            "comments_from_students": [{"Comments": f"Great course {index}"}, {"Comments": "Hard but fair"}],
+        },
+    }
+    record.update(overrides)
+    return record
+
+class ImportTestCase(FakeRedisTestCase):
+    """Runs import_courses on dumps written to a temporary directory"""
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_dump(self, records, name='dump.json'):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            json.dump(records, f)
+        return path
+
+    def import_courses(self, records, **options):
+        """Run the command on a dump of records; returns (output, the import summary it wrote)"""
+        stdout = io.StringIO()
+        summary = mock.mock_open()
+        # import_summary.json goes to the app's static directory; keep the real one untouched
+        with mock.patch('courses.management.commands.import_courses.open', summary, create=True):
+            call_command('import_courses', input=self.write_dump(records), stdout=stdout, **options)
+        written = ''.join(call.args[0] for call in summary().write.call_args_list)
+        return stdout.getvalue(), json.loads(written)
+
+class ImportCoursesTests(ImportTestCase):
+    def test_imports_courses_and_child_rows(self):
+        output, summary = self.import_courses([course_record(index) for index in range(5)], batch_size=2)
+
+        self.assertEqual(Course.objects.count(), 5)
+        self.assertEqual(CourseFeedbackQuestion.objects.count(), 10)
+        self.assertEqual(InstructorFeedbackQuestion.objects.count(), 5)
+        self.assertEqual(HoursAndRecQuestion.objects.count(), 5)
+        self.assertEqual(CourseComment.objects.count(), 10)
+        self.assertEqual(summary['Import Summary']['Courses Created'], 5)
+        self.assertEqual(summary['Import Summary']['Feedback Questions Created'], 15)
+        self.assertEqual(summary['Import Summary']['Comments Created'], 10)
+
+        course = Course.objects.get(url='https://qreports.example/3')
+        self.assertEqual(course.responses, 10)
+        self.assertEqual(course.response_ratio, 0.5)
+        self.assertEqual(course.course_mean_rating, 4.5)
+        self.assertEqual(course.number_comments, 2)
+        self.assertEqual(course.hours_breakdown.response_count, 9)
+        self.assertEqual(course.hours_breakdown.response_ratio, 0.45)
+
+    def test_failing_course_is_reported_and_rest_of_batch_committed(self):
+        records = [course_record(index) for index in range(4)]
+        # Parses fine but violates NOT NULL on insert, failing its whole batch
+        records[1]['Title'] = None
+
+        output, summary = self.import_courses(records, batch_size=4)
+
+        self.assertEqual(
+            sorted(Course.objects.values_list('url', flat=True)),
+            ['https://qreports.example/0', 'https://qreports.example/2', 'https://qreports.example/3'],
+        )
+        self.assertEqual(CourseFeedbackQuestion.objects.count(), 6)
+        self.assertEqual(CourseComment.objects.count(), 6)
+        self.assertIn("Error importing 'None' (https://qreports.example/1)", output)
+        self.assertEqual(summary['Import Summary']['Courses Created'], 3)
+
+    def test_unparseable_course_is_reported_and_skipped(self):
+        records = [course_record(index) for index in range(3)]
+        records[0]['Feedback']['course_response_rate'] = [{"Students": "many"}]
+
+        output, summary = self.import_courses(records)
+
+        self.assertEqual(Course.objects.count(), 2)
+        self.assertIn("invalid literal for int()", output)
+
+    def test_existing_urls_are_skipped(self):
+        self.import_courses([course_record(index) for index in range(2)])
+        changed = course_record(1, Title="Renamed")
+
+        output, summary = self.import_courses([course_record(0), changed, course_record(2)])
+
+        self.assertEqual(Course.objects.count(), 3)
+        self.assertEqual(Course.objects.get(url='https://qreports.example/1').title, "Course 1")
+        self.assertEqual(CourseFeedbackQuestion.objects.count(), 6)
+        self.assertEqual(summary['Import Summary']['Courses Created'], 1)
+        self.assertEqual(output.count("already exists. Skipping."), 2)
+
+    def test_only_first_hours_row_is_imported(self):
+        record = course_record(0)
+        record['Feedback']['hours_and_rec_questions'].append(
+            {"Response Count": "3", "Response Ratio": "15%", "Mean": "9", "Median": "9", "Mode": "9", "Standard Deviation": "0"},
+        )
+
+        self.import_courses([record])
+
+        self.assertEqual(HoursAndRecQuestion.objects.count(), 1)
+        self.assertEqual(HoursAndRecQuestion.objects.get().response_count, 9)
+
+class IncrementalImportTests(ImportTestCase):
+    def setUp(self):
+        super().setUp()
+        self.records = [course_record(index) for index in range(3)]
+        self.import_courses(self.records, incremental=True)
+
+    def test_unchanged_dump_changes_nothing(self):
+        version = get_data_version('courses')
+
+        output, summary = self.import_courses(self.records, incremental=True)
+
+        self.assertEqual(summary['Import Summary']['Courses Created'], 0)
+        self.assertEqual(summary['Import Summary']['Courses Updated'], 0)
+        self.assertEqual(summary['Import Summary']['Courses Unchanged'], 3)
+        self.assertEqual(get_data_version('courses'), version)
+
+    def test_changed_course_is_updated_in_place(self):
+        course = Course.objects.get(url='https://qreports.example/1')
+        version = get_data_version('courses')
+        self.records[1]['Title'] = "Renamed"
+        self.records[1]['Feedback']['comments_from_students'] = [{"Comments": "Rewritten"}]
+
+        output, summary = self.import_courses(self.records, incremental=True)
+
+        self.assertEqual(summary['Import Summary']['Courses Created'], 0)
+        self.assertEqual(summary['Import Summary']['Courses Updated'], 1)
+        self.assertEqual(summary['Import Summary']['Courses Unchanged'], 2)
+        self.assertEqual(summary['Import Summary']['Changed Course IDs'], [course.id])
+        updated = Course.objects.get(url='https://qreports.example/1')
+        self.assertEqual(updated.id, course.id)
+        self.assertEqual(updated.title, "Renamed")
+        self.assertNotEqual(updated.content_hash, course.content_hash)
+        # Child rows are replaced, not added to
+        self.assertEqual(list(updated.comments.values_list('comment_text', flat=True)), ["Rewritten"])
+        self.assertEqual(updated.course_feedback_questions.count(), 2)
+        self.assertEqual(CourseFeedbackQuestion.objects.count(), 6)
+        self.assertEqual(HoursAndRecQuestion.objects.count(), 3)
+        self.assertGreater(get_data_version('courses'), version)
+
+    def test_new_course_is_created_alongside_unchanged_ones(self):
+        output, summary = self.import_courses(self.records + [course_record(3)], incremental=True)
+
+        self.assertEqual(summary['Import Summary']['Courses Created'], 1)
+        self.assertEqual(summary['Import Summary']['Courses Updated'], 0)
+        self.assertEqual(Course.objects.count(), 4)
+
+class CourseListFallbackTests(FakeRedisTestCase):
+    """The full list falls back to the database when Redis is down, and only then"""
+    def setUp(self):
+        super().setUp()
+        Course.objects.create(title='Course 1', term='2023 Fall', url='https://qreports.example/1')
+        self.view = CourseViewSet.as_view({'get': 'list'})
+
+    def test_cache_outage_is_served_from_the_database(self):
+        with mock.patch.object(CourseViewSet, 'cached_list_response', side_effect=ConnectionInterrupted(connection=None)), \
+                self.assertLogs('courses.views', 'ERROR'):
+            response = self.view(APIRequestFactory().get('/api/courses/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([course['title'] for course in response.data], ['Course 1'])
+
+    def test_other_errors_are_not_masked(self):
+        with mock.patch.object(CourseViewSet, 'cached_list_response', side_effect=ValueError('bug')), \
+                mock.patch.object(CourseViewSet, 'uncached_list_response') as uncached:
+            with self.assertRaises(ValueError):
+                self.view(APIRequestFactory().get('/api/courses/'))
+        uncached.assert_not_called()
+
+class DedupeCourseUrlsMigrationTests(TransactionTestCase):
+    before = [('courses', '0011_course_courses_cou_title_974ba1_idx')]
+    after = [('courses', '0012_dedupe_course_urls')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_keeps_first_course_per_url(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        OldCourse = executor.loader.project_state(self.before).apps.get_model('courses', 'Course')
+        fields = {'department': 'CS', 'instructor': 'Prof', 'term': '2023 Fall', 'subject': 'CS', 'blue_course_id': '1'}
+        first = OldCourse.objects.create(title='First', url='https://qreports.example/dup', **fields)
+        OldCourse.objects.create(title='Second', url='https://qreports.example/dup', **fields)
+        other = OldCourse.objects.create(title='Other', url='https://qreports.example/other', **fields)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        NewCourse = executor.loader.project_state(self.after).apps.get_model('courses', 'Course')
+
+        self.assertEqual(sorted(NewCourse.objects.values_list('id', 'title')), [(first.id, 'First'), (other.id, 'Other')])
+
+class CleanNumericValueTests(SimpleTestCase):
+    def test_whole_numbers(self):
+        self.assertEqual(clean_numeric_value("12"), 12)
+        self.assertEqual(clean_numeric_value("12.0"), 12)
+        self.assertEqual(clean_numeric_value(12), 12)
+
+    def test_missing_values(self):
+        for value in ("NRP", "NA", "", "N/A", None):
+            self.assertIsNone(clean_numeric_value(value))
+
+    def test_percentages_and_garbage(self):
+        self.assertEqual(clean_numeric_value("0%"), 0)
+        self.assertIsNone(clean_numeric_value("twelve"))
+
+class CountingReader(io.StringIO):
+    """StringIO that remembers how many characters have been read from it"""
+    def __init__(self, value):
+        super().__init__(value)
+        self.characters_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.characters_read += len(data)
+        return data
+
+class IterCourseRecordsTests(SimpleTestCase):
+    def setUp(self):
+        self.records = [course_record(index) for index in range(5)]
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, text):
+        path = os.path.join(self.directory.name, 'dump')
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_json_array_with_stdlib_parser(self):
+        path = self.write(json.dumps(self.records, indent=2))
+        with mock.patch.object(importer, 'ijson', None):
+            self.assertEqual(list(iter_course_records(path)), self.records)
+
+    def test_json_array_across_reads(self):
+        # Every record spans several reads
+        reader = CountingReader(' [ ' + ' , '.join(json.dumps(record) for record in self.records) + ' ] ')
+        self.assertEqual(list(iter_json_array(reader, read_size=64)), self.records)
+
+    def test_json_lines(self):
+        path = self.write('\n'.join(json.dumps(record) for record in self.records) + '\n\n')
+        self.assertEqual(list(iter_course_records(path)), self.records)
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('{"Title": "Course"}')))
+
+    def test_malformed_record_fails_without_reading_the_rest(self):
+        valid = json.dumps(self.records[0])
+        reader = CountingReader('[' + valid + ', {"Title": oops}, ' + ', '.join([valid] * 2000) + ']')
+
+        items = iter_json_array(reader, read_size=64, max_item_size=4096)
+        self.assertEqual(next(items), self.records[0])
+        with self.assertRaises(ValueError):
+            next(items)
+        self.assertLess(reader.characters_read, 4096 + len(valid) + 128)
+
+    def test_truncated_dump(self):
+        text = json.dumps(self.records)[:-40]
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO(text), read_size=64))
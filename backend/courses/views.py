@@ -1,72 +1,147 @@
-from django.db.models import Q
+from django.db.models import Max, Q
 from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework_datatables import filters as dt_filters
 from .models import Course
 from .serializers import CourseSerializer
-from rest_framework.pagination import PageNumberPagination, LimitOffsetPagination
-from django.utils.http import http_date, quote_etag
-from core.cache_utils import cache, get_cached_data
-from django.db import connection
+from rest_framework.pagination import CursorPagination
+from rest_framework.settings import api_settings
+from core.cache_utils import (
+    CACHE_ERRORS, QUERY_CACHE_TIMEOUT, build_payload, cache, get_data_version, local_cache, payload_size,
+)
+from core.responses import apply_validators, not_modified_response, payload_response
+from core.renderers import ColumnarJSONRenderer
+from core.viewsets import CachedListMixin
+from .filters import CourseQuery
+from core.db import with_db_retry
 import hashlib
-import json
-from django.core.serializers.json import DjangoJSONEncoder
-import zlib
+import logging
 
-REQUEST_LIMIT = None
+logger = logging.getLogger(__name__)
 
-class CoursePagination(LimitOffsetPagination):
-    default_limit = REQUEST_LIMIT
+class CoursePagination(CursorPagination):
+    """
+    Opt-in keyset pagination (?cursor=) walking the (title, id) index, so
+    any page costs the same as the first one regardless of depth.
+    """
+    ordering = ('title', 'id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
 
-def generate_etag(data):
-    """Generate an ETag from the data"""
-    data_str = json.dumps(data, sort_keys=True)
-    return hashlib.md5(data_str.encode()).hexdigest()
+# Rating families the course table shows by default; each renders all five variants
+TABLE_RATINGS = ('course', 'assignments', 'section', 'instructor')
 
-class CourseViewSet(viewsets.ReadOnlyModelViewSet):
+class CourseViewSet(CachedListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Course.objects.all().order_by('title')
     serializer_class = CourseSerializer
     pagination_class = None  # Disable pagination for full dataset caching
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer]
+    cache_name = 'courses'
+    dictionary_fields = tuple(
+        field.name for field in Course._meta.get_fields()
+        if field.name in ('department', 'term', 'subject') or field.name.endswith(('_grade', '_grade_department'))
+    )
+    field_profiles = {
+        'table': (
+            'id', 'title', 'department', 'instructor', 'term', 'url', 'invited_responses',
+            'hours_mean_rating', 'recommend_mean_rating', 'number_comments',
+        ) + tuple(
+            f'{rating}_{suffix}'
+            for rating in TABLE_RATINGS
+            for suffix in (
+                'mean_rating', 'mean_rating_bayesian_score', 'mean_grade',
+                'mean_rating_bayesian_score_department', 'mean_grade_department',
+            )
+        ),
+        'summary': (
+            'id', 'title', 'department', 'instructor', 'term', 'url',
+            'course_mean_rating_bayesian_score', 'course_mean_grade',
+        ),
+    }
 
-    def get_queryset(self):
-        """Get queryset with proper connection handling"""
-        connection.close()  # Close any stale connections
-        return super().get_queryset()
+    @with_db_retry
+    def cursor_page_response(self, request, fields=None):
+        """Serve one keyset page, cached per data version and query unless it is a search or ad-hoc fieldset"""
+        if request.query_params.get('ordering'):
+            # The cursor encodes a position in the (title, id) order, so pages can't be re-sorted
+            raise ValidationError({'ordering': 'Cursor pages are always ordered by title; drop ordering or cursor.'})
+        if self.get_layout() == 'columnar':
+            raise ValidationError({'format': 'Cursor pages are only available as rows; drop format=columnar or cursor.'})
+        cacheable = self.is_cached_query(request, fields)
+        url = request.build_absolute_uri()
+        cache_key = f"courses_page:{get_data_version('courses')}:{hashlib.md5(url.encode()).hexdigest()}"
+        data = cache.get(cache_key) if cacheable else None
+        if data is None:
+            queryset = self.get_queryset()
+            if CourseQuery.is_requested(request):
+                queryset = CourseQuery.from_request(request).apply(queryset)
+            paginator = CoursePagination()
+            page = paginator.paginate_queryset(self.get_fields_queryset(queryset, fields), request, view=self)
+            data = paginator.get_paginated_response(self.get_serializer(page, many=True, fields=fields).data).data
+            if cacheable:
+                cache.set(cache_key, data, QUERY_CACHE_TIMEOUT)
+        return Response(data)
+
+    def is_cached_query(self, request, fields):
+        """
+        Free-text searches and ad-hoc fieldsets have no useful bound on how many
+        variants there are, so only filter/sort queries over a cached fieldset
+        are worth storing
+        """
+        return self.is_cached_fieldset(fields) and not request.query_params.get('search', '').strip()
+
+    @with_db_retry
+    def build_query_payload(self, query, fields=None):
+        """Render and compress one filtered/sorted subset"""
+        queryset = query.apply(self.get_queryset())
+        last_modified = queryset.aggregate(last_modified=Max('modified_at'))['last_modified']
+        return build_payload(self.render_list(queryset, fields), last_modified)
+
+    def query_response(self, request, fields=None):
+        """Serve a filtered/sorted subset, pre-encoded and briefly cached per normalized query"""
+        query = CourseQuery.from_request(request)
+        if not self.is_cached_query(request, fields):
+            return self.rendered_list_response(request, query.apply(self.get_queryset()), fields)
+        version = get_data_version('courses')
+        cache_key = query.cache_key(version, fields, self.get_layout())
+        cached = local_cache.get(cache_key, version)
+        if cached is None:
+            cached = cache.get(cache_key)
+            if cached is None:
+                cached = self.build_query_payload(query, fields)
+                cache.set(cache_key, cached, QUERY_CACHE_TIMEOUT)
+            local_cache.set(cache_key, version, cached, payload_size(cached[0]))
+
+        payload, metadata = cached
+        response = not_modified_response(request, metadata)
+        if response is not None:
+            return response
+        return apply_validators(payload_response(request, payload), metadata)
 
     def list(self, request, *args, **kwargs):
-        # If it's a HEAD request, return just headers without body
-        if request.method == 'HEAD':
-            return Response(headers={
-                'X-Total-Count': Course.objects.count(),
-                'Content-Type': 'application/json',
-            })
+        fields = self.get_requested_fields(request)
 
-        try:
-            # Try to get compressed data from cache
-            compressed_data = cache.get('compressed_courses_data')
-            if compressed_data:
-                # Decompress and return
-                json_data = zlib.decompress(compressed_data).decode('utf-8')
-                return Response(json.loads(json_data))
+        # Clients opt into keyset pagination by sending ?cursor= (empty for the first page)
+        if CoursePagination.cursor_query_param in request.query_params:
+            return self.cursor_page_response(request, fields)
+        if CourseQuery.is_requested(request):
+            return self.query_response(request, fields)
 
-            # If not in cache, get from database
-            connection.ensure_connection()
-            queryset = self.get_queryset()
-            serializer = self.get_serializer(queryset, many=True)
-            data = serializer.data
+        # HEAD is answered from the cached list's metadata, not the database
+        if request.method == 'HEAD':
+            return self.list_metadata_response(request, body=False)
 
-            # Compress and cache the data
-            json_data = json.dumps(data, cls=DjangoJSONEncoder)
-            compressed = zlib.compress(json_data.encode('utf-8'))
-            cache.set('compressed_courses_data', compressed, timeout=86400)  # 24 hours
+        try:
+            # Serve the pre-rendered, pre-compressed body straight from cache
+            return self.cached_list_response(request, fields)
+        except CACHE_ERRORS:
+            logger.exception("Cached course list unavailable, serving it from the database")
+            return self.uncached_list_response(request, fields)
 
-            return Response(data)
-        except Exception as e:
-            connection.ensure_connection()
-            try:
-                queryset = self.get_queryset()
-                serializer = self.get_serializer(queryset, many=True)
-                return Response(serializer.data)
-            finally:
-                connection.close()
\ No newline at end of file
+    @action(detail=False, methods=['get', 'head'])
+    def meta(self, request):
+        """Count, data version, ETag, size and last-modified of the full list, from cache metadata"""
+        return self.list_metadata_response(request, body=request.method != 'HEAD')
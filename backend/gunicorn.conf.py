@@ -1,12 +1,15 @@
 import multiprocessing
 import os
+import sys
 
 # Number of worker processes
 workers = 2  # Reduced from default to conserve memory
 threads = 1  # Single thread per worker for thread safety
 
 # Worker settings
-worker_class = 'sync'  # Use sync workers instead of gevent
+# Set GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker (with ASYNC_API=true and
+# core.asgi:application) so one worker can serve many slow downloads at once
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
 worker_connections = 1000
 
 # Timeouts
@@ -53,7 +56,11 @@ def pre_fork(server, worker):
     """
     Called just prior to forking a worker.
     """
-    pass
+    # Workers keep their own persistent connections (CONN_MAX_AGE); one
+    # opened in the master (e.g. with preload_app) must not be shared with them
+    if 'django.db' in sys.modules:
+        from django.db import connections
+        connections.close_all()
 
 def pre_exec(server):
     """
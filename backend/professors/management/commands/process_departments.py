@@ -4,6 +4,7 @@ from collections import defaultdict
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from professors.models import Department
+from core.cache_utils import invalidate_dataset
 
 class Command(BaseCommand):
     help = 'Calculate department statistics from professor data'
@@ -70,6 +71,7 @@ class Command(BaseCommand):
                     }
                 )
 
+            invalidate_dataset('departments')
             self.stdout.write(
                 self.style.SUCCESS(f'Successfully updated {len(department_stats)} departments')
             )
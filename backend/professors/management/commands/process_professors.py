@@ -3,6 +3,7 @@ import os
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from professors.models import Professor, Department
+from core.cache_utils import invalidate_dataset
 
 # Updated process_professors command
 class Command(BaseCommand):
@@ -48,6 +49,7 @@ class Command(BaseCommand):
                     intra_department_metrics=prof_data.get('Department Metrics', '')
                 )
 
+            invalidate_dataset('professors')
             self.stdout.write(self.style.SUCCESS(f'Successfully processed {total} professors'))
 
         except json.JSONDecodeError:
@@ -1,8 +1,8 @@
-from rest_framework import serializers
+from core.serializers import DynamicFieldsModelSerializer
 from .models import Professor, Department
 from django.core.exceptions import FieldDoesNotExist
 
-class DepartmentSerializer(serializers.ModelSerializer):
+class DepartmentSerializer(DynamicFieldsModelSerializer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Dynamically remove fields that don't exist in the model
@@ -15,7 +15,7 @@ class DepartmentSerializer(serializers.ModelSerializer):
         model = Department
         fields = ['id', 'name', 'empirical_bayes_average', 'empirical_bayes_rank', 'professor_count']
 
-class ProfessorSerializer(serializers.ModelSerializer):
+class ProfessorSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Professor
         fields = '__all__'
@@ -1,42 +1,39 @@
 from rest_framework import viewsets
-from rest_framework.response import Response
 from .models import Professor, Department
 from .serializers import ProfessorSerializer, DepartmentSerializer
-from core.cache_utils import get_cached_data
-from django.db import connection
+from core.cache_utils import CACHE_ERRORS
+from core.viewsets import CachedListMixin
+import logging
 
-class ProfessorViewSet(viewsets.ReadOnlyModelViewSet):
+logger = logging.getLogger(__name__)
+
+class ProfessorViewSet(CachedListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Professor.objects.all().order_by('empirical_bayes_rank')
     serializer_class = ProfessorSerializer
     pagination_class = None  # Disable pagination for full dataset caching
+    cache_name = 'professors'
+    field_profiles = {
+        'summary': ('id', 'name', 'departments', 'empirical_bayes_average', 'empirical_bayes_rank', 'overall_letter_grade'),
+    }
 
     def list(self, request, *args, **kwargs):
+        fields = self.get_requested_fields(request)
         try:
-            data = get_cached_data('professors_data')
-            return Response(data)
-        except Exception as e:
-            connection.ensure_connection()
-            try:
-                queryset = self.get_queryset()
-                serializer = self.get_serializer(queryset, many=True)
-                return Response(serializer.data)
-            finally:
-                connection.close()
+            return self.cached_list_response(request, fields)
+        except CACHE_ERRORS:
+            logger.exception("Cached professor list unavailable, serving it from the database")
+            return self.uncached_list_response(request, fields)
 
-class DepartmentViewSet(viewsets.ReadOnlyModelViewSet):
+class DepartmentViewSet(CachedListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Department.objects.all().order_by('name')
     serializer_class = DepartmentSerializer
     pagination_class = None  # Disable pagination for full dataset caching
+    cache_name = 'departments'
 
     def list(self, request, *args, **kwargs):
+        fields = self.get_requested_fields(request)
         try:
-            data = get_cached_data('departments_data')
-            return Response(data)
-        except Exception as e:
-            connection.ensure_connection()
-            try:
-                queryset = self.get_queryset()
-                serializer = self.get_serializer(queryset, many=True)
-                return Response(serializer.data)
-            finally:
-                connection.close()
\ No newline at end of file
+            return self.cached_list_response(request, fields)
+        except CACHE_ERRORS:
+            logger.exception("Cached department list unavailable, serving it from the database")
+            return self.uncached_list_response(request, fields)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Concurrent download load test for the list endpoints.
+
+Opens --concurrency connections at once, each fetching --path --requests
+times, optionally reading the body slowly (--read-rate bytes/s) to mimic
+clients on slow links. Reports throughput, latency percentiles and the
+effective concurrency (total request time / wall time): with sync workers it
+stays near the worker count, under uvicorn workers it should track the
+number of clients. Point it at an instance with raised
+DEFAULT_THROTTLE_RATES, or most requests will be answered with a 429.
+
+    python scripts/load_test.py --base-url http://localhost:10000 --concurrency 50 --read-rate 200000
+"""
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import argparse
+import http.client
+import statistics
+import time
+
+def fetch(base_url, path, read_rate, token=None):
+    """Fetch one URL and return (status, bytes read, seconds, session token)"""
+    parts = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    connection = connection_class(parts.netloc, timeout=300)
+    headers = {'Accept-Encoding': 'gzip, br'}
+    if token:
+        headers['X-Session-Token'] = token
+
+    started = time.perf_counter()
+    try:
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        size = 0
+        block = 16384
+        while True:
+            data = response.read(block)
+            if not data:
+                break
+            size += len(data)
+            if read_rate:
+                time.sleep(len(data) / read_rate)
+        return response.status, size, time.perf_counter() - started, response.getheader('X-Session-Token')
+    finally:
+        connection.close()
+
+def run_client(base_url, path, requests, read_rate):
+    results = []
+    token = None
+    for _ in range(requests):
+        status, size, elapsed, token = fetch(base_url, path, read_rate, token)
+        results.append((status, size, elapsed))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:10000')
+    parser.add_argument('--path', default='/api/courses/')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=5, help='Requests per client')
+    parser.add_argument('--read-rate', type=int, default=0, help='Per-client read rate in bytes/s (0 = as fast as possible)')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [
+            executor.submit(run_client, args.base_url, args.path, args.requests, args.read_rate)
+            for _ in range(args.concurrency)
+        ]
+        results = [result for future in futures for result in future.result()]
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed for _, _, elapsed in results)
+    statuses = {}
+    for status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    print(f"{len(results)} requests in {wall:.2f}s ({len(results) / wall:.1f} req/s)")
+    print(f"statuses: {statuses}")
+    print(f"bytes: {sum(size for _, size, _ in results)}")
+    print(
+        f"latency: p50 {statistics.median(latencies) * 1000:.0f}ms"
+        f"  p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f}ms"
+        f"  max {latencies[-1] * 1000:.0f}ms"
+    )
+    print(f"effective concurrency: {sum(latencies) / wall:.1f}")
+
+if __name__ == '__main__':
+    main()
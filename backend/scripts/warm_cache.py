@@ -10,11 +10,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 django.setup()
 
-from core.cache_utils import warm_cache
-import logging
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from django.core.management import call_command
 
 if __name__ == '__main__':
-    warm_cache()
+    # Kept for existing deploy scripts; same as `python manage.py warm_cache`
+    call_command('warm_cache', *sys.argv[1:])